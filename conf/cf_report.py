@@ -45,11 +45,18 @@ cf = {
     'other_files': '[!.]*.png',
     'other_files_exclude': ['throughput.png', 'traffic.png'],  # files to be excluded
     'image_files': '[!.]*.png',
+    'image_dpi': 150,  # images downscaled to the display size at this dpi, 0 for full resolution
 
     'job_dir': 'job-*',
     'cli_file': 'cli-[0-9]*.log',
     'ctx_file': 'ctx.json',
+    'export_file': 'report.json',  # case records in report_dir, input for later reports through export_input
+    'export_formats': ['csv', 'json'],  # raw results and bp summaries, add 'parquet' with pyarrow installed
+    'export_input': '',  # report.json of an earlier report, cases taken from it without reading pdfs or jobs
+    'manifest_file': '.report_manifest.json',  # in poc_dir, inputs and outputs per case for reruns, '' to disable
     'sta_file': 'sta-[0-9]*.json',
+    'ts_file': 'ts-[0-9]*.npz',
+    'db_file': '',  # cross-job database (pan_db.py) for the results table, '' to read job folders directly
     # 'dp_files_list': ['dp0-0.png', 's[0-9]*dp[0-9]*-0.png'],
     'dp_files_list': ['dp-*.png'],
     # 'p_files_list': ['p-[0-9].png', 'p-[0-9][0-9].png'],    # grid of plots
@@ -92,8 +99,16 @@ cf = {
         # 'tcp_average_time_to_close': 'TCP Average Time to Close',                   # section 7.26.23
     },
     'bp_section_re': r'^\d+(\.\d+)+\.',
+    'pdf_workers': 0,  # processes for pdf extraction, 0 for one per cpu, 1 for none
+    'job_workers': 0,  # threads reading job folders, 0 for the default
+    'pdf_cache_dir': 'data/.bp_cache',  # extraction results by pdf hash and bp_* settings, '' to disable
     'bp_table_values_trim': (0.05, 0.05),  # remove the first 5% and the last 5%
+    'bp_table_percentiles': [],  # additional percentiles in table summaries, e.g. [95, 99] for p95 and p99
 
+    'pa_commands': [  # command blocks in cli-*.log with pa_attrs
+        r'show\s+system\s+info',
+        r'show\s+session\s+info',  # sessions supported
+    ],
     'pa_attrs': [
         'model',
         'sw-version',
@@ -42,14 +42,27 @@ cf = {
     'job_dir':  'job-{}-{}',            # job folder
     'log_file': 'job-{}.log',           # job log
     'cnf_file': 'cf-{}.json',           # config dump
-    'cli_file': 'cli-{}.log',           # CLI output
+    'cli_file': 'cli-{}.log',           # CLI output, blocks indexed in cli-{}.log.idx.json
+    'cli_log_markers': False,           # '#### [<cli set>_<iteration>] <timestamp> <command>' line before each output
     'sta_file': 'sta-{}.json',          # stats
+    'ts_file': 'ts-{}.npz',             # metric samples (int64 epoch ns, float32 values), '' to keep them in sta_file
     'tra_file': 'tra-{}.json',          # traffic logs in json format
     'ctx_file': 'ctx-{}.json',
+    'db_file': '',                      # cross-job SQLite database (pan_db.py), '' to disable
+    'case': '',                         # test case of the job in db_file
 
     'plot_file': 'p{0}-{1}.png',        # stats plot file names
     'plot_file_combined': 'p-{0}.png',  # stats combined plot file names
     'plot_grid_size': (3, 3),           # grid size (rows, columns) of combined plots
+    'plot_formats': ['png'],            # e.g. ['png', 'svg'] or ['pdf'] for vector plots, report.py embeds png
+    'plot_downsample': 'minmax',        # (minmax, lttb) for series over 300 samples, plotted as sampled, '' to disable
+    'plot_downsample_points': 2000,     # max points plotted of such a series, all samples if fewer
+
+    'sta_percentiles': [50, 90, 95, 99],  # percentiles of each metric in sta_file
+    'sta_thresholds': {                 # time (s) above the threshold of each metric in sta_file
+        'flow_ctrl': 80,
+        'sessionTableUtil': 80,
+    },
 
     'traffic_analysis': True,
     'tra_cols': [
@@ -114,7 +127,7 @@ c1 = [
     ('q', 1, 0),  # q to stop
     'set cli pager off',
     'show session all filter application dns-base count yes',           # sessionFilterCount for dns-base
-    'show running resource-monitor second last 30',
+    'show running resource-monitor second last 30',                     # window resized per iteration, see dp['window_*']
     'show system resources | match ": "',                               # systemResources*
     'debug dataplane show ssl-decrypt ssl-stats',
     # ('show session all filter count yes ssl-decrypt yes', 1, 10),     # decrypted sessions
@@ -152,14 +165,19 @@ cli = [
 # dictionary of search patterns for runtime metrics such as allocated sessions, packet rate, etc.
 # These search patterns are regex for locating target numbers from output files
 #
+# regex                                    # one or more values
+# (regex, legends) or (regex, legends, k)  # legends of the values, k for the value highlighted
+# {'regex': regex, 'type': 'counter'}      # cumulative counter, also as <metric>_delta and <metric>_rate (per second)
+#                                          # wraps at 'wrap' (default 2 ** 64), otherwise a decrease is a reset
+#
 metrics = {
     'activeTCPSessions':    r'active TCP sessions:\s+(\d+)',
     'activeUDPSessions':    r'active UDP sessions:\s+(\d+)',
     'allocatedSessions':    r'allocated sessions:\s+(\d+)',
     'chassisPower':         r'Used:\s+(\d+)',
     'connectionRate':       r'connection establish rate:\s+(\d+) cps',
-    'ethBytesReceived':     r'bytes received\s+(\d+)',
-    'ethPacketsReceived':   r'packets received\s+(\d+)',
+    'ethBytesReceived':     {'regex': r'bytes received\s+(\d+)', 'type': 'counter'},    # with _delta and _rate
+    'ethPacketsReceived':   {'regex': r'packets received\s+(\d+)', 'type': 'counter'},  #
     'flow_ctrl':            r'flow_ctrl\s+:\s+(\d+)%',
     'logReceiverLogRate':   r'Log incoming rate:\s+(\d+)\/sec',
     'packetRate':           r'Packet rate:\s+(\d+)\/s',
@@ -194,7 +212,8 @@ metrics2 = {  # derived metrics
         "np.column_stack((activeTCPSessions, activeUDPSessions, allocatedSessions))",
         ['tcp', 'udp', 'allocated'], 2,
     ),
-    'ethPacketSizesAverage':    "ethBytesReceived / ethPacketsReceived",
+    'ethPacketSizesAverage':    "ethBytesReceived_delta / ethPacketsReceived_delta",
+    'ethThroughputMbps':        "ethBytesReceived_rate * 8 / 1e6",
     'systemResourcesCpuUsSy':   "systemResourcesCpu[:, 0] + systemResourcesCpu[:, 1]",
     'systemResourcesCpuBusy': (
         "np.column_stack((100 - systemResourcesCpu[:, 3], systemResourcesCpu[:, 3]))",
@@ -205,13 +224,13 @@ metrics2 = {  # derived metrics
 dp = {
     'command':              r'show\s+running\s+resource-monitor',
     'dp_name':              r'^DP\s+(s\d+dp\d+):',
-    'cpu_load':             r'CPU load \(%\) during last (\d+) seconds:',
-    'res_util':             r'Resource utilization \(%\) during last (\d+) seconds:',
-    'resources':            {
-        'se': r'session:',
-        'pb': r'packet buffer:',
-        'pd': r'packet descriptor:',
-        'sw': r'sw tags descriptor:',
+    'cpu_load':             r'CPU load \(%\) during last (\d+) (second|minute)s?:',
+    'res_util':             r'Resource utilization \(%\) during last (\d+) (second|minute)s?:',
+    'resources':            {  # headers at second or minute granularity, e.g. 'session (average):'
+        'se': r'session( \(\w+\))?:',
+        'pb': r'packet buffer( \(\w+\))?:',
+        'pd': r'packet descriptor( \(\w+\))?:',
+        'sw': r'sw tags descriptor( \(\w+\))?:',
     },
     'core':                 'core',
     'dp_name_default':      'dp0',  # do not use dp use dp0
@@ -222,9 +241,21 @@ dp = {
     'plot_file':            "{0}-{1}.png",
     'plot_file_combined':   "dp-{0}.png",
     'plot_grid_size':       cf['plot_grid_size'],  # (3, 3),  # (rows, columns) for combined plots
+    'heatmap_file':         "heatmap-dp.png",  # all cores of all DPs in one image, '' to disable
+    'heatmap_bins':         1000,  # max time bins (columns) of the heatmap, max load in each
+    'heatmap_cmap':         'inferno',
+    'compare_file':         "compare-dp.png",  # ave/max of all DPs overlaid, '' to disable
+    'summary_file':         "dp-summary.json",  # mean, p95, max and time above threshold of ave/max by DP, '' to disable
+    'threshold':            80,  # CPU load (%) for the time above threshold
     'skip_first_row':       True,  # address the issue where the most recent data row is incomplete (all low values)
     'skip_dp_names':        ["s1dp0", "s2dp0"],  # currently not used
     'interp':               ["pchip", "spline"][0],  # interpolation algorithm for DP plots
+    'downsample':           cf['plot_downsample'],
+    'downsample_points':    cf['plot_downsample_points'],
+    'window_adaptive':      True,  # window sized from the time elapsed since the last DP sample
+    'window_command':       'show running resource-monitor {0} last {1}',  # unit (second|minute), window; only CLI entries of this form resized
+    'window_max':           60,  # device limit for 'last N', minute granularity beyond it
+    'minute_row':           'avg',  # row kept from (avg, max) rows at minute granularity
 }
 
 if __name__ == '__main__':
@@ -17,14 +17,20 @@ https://pexpect.readthedocs.io/en/stable/index.html
 """
 
 import argparse
+import ast
 import importlib.util
 import json
 import logging
+import math
 import os
 import re
 import sys
 import time
+import warnings
 from datetime import datetime, timedelta
+from functools import partial
+from graphlib import CycleError, TopologicalSorter
+from pathlib import Path
 
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
@@ -36,11 +42,27 @@ from paramiko_expect import SSHClientInteraction
 from scipy.interpolate import make_interp_spline, PchipInterpolator
 
 from pan_api import pan_api
+from pan_cli_log import cli_log_write
+from pan_db import db_connect, db_ingest_job
 from pan_log import pan_get_traffic_logs
+from pan_ts import ts_write
 
 
 cf, cli, metrics, dp = {}, [], {}, {}
 
+PLOT_POINTS = 300  # points of an interpolated plot, longer series plotted as sampled to keep their peaks
+
+METRICS2_FUNCTIONS = {  # np functions allowed in metrics2 expressions
+    'abs', 'add', 'clip', 'column_stack', 'cumsum', 'diff', 'divide', 'exp', 'hstack', 'isnan', 'log', 'log10',
+    'max', 'maximum', 'mean', 'min', 'minimum', 'multiply', 'nan_to_num', 'nanmax', 'nanmean', 'nanmin', 'round',
+    'sqrt', 'stack', 'subtract', 'sum', 'vstack', 'where',
+}
+
+METRICS2_NODES = (  # syntax allowed in metrics2 expressions, besides np.<function> calls and numbers
+    ast.Expression, ast.Name, ast.Load, ast.BinOp, ast.operator, ast.UnaryOp, ast.unaryop, ast.Compare, ast.cmpop,
+    ast.Subscript, ast.Slice, ast.Tuple, ast.keyword,
+)
+
 ctx = {  # context to store runtime data
     'start_time': datetime.now(),
 }
@@ -91,6 +113,12 @@ def init():
     ctx['verbose'] = cf['verbose'] or ctx['args'].verbose
     ctx['debug'] = cf['debug']
 
+    ctx['metrics2'], errors = metrics2_compile()
+    if errors:
+        print("metrics2 errors:\n" + "\n".join(f"\t{e}" for e in errors), file=sys.stderr)
+        print(f"check {ctx['args'].conf} for details", file=sys.stderr)
+        sys.exit(1)
+
     msg_buf = []
 
     a, h, u, p, e = None, 'hostname', 'username', 'password', 'passenv'
@@ -129,12 +157,14 @@ def init():
     start_time = ctx['start_time']
     ddhhmm = start_time.strftime('%d%H%M')
 
-    for f in ('job_dir', 'log_file', 'cnf_file', 'cli_file', 'sta_file', 'tra_file', 'ctx_file'):
+    for f in ('job_dir', 'log_file', 'cnf_file', 'cli_file', 'sta_file', 'ts_file', 'tra_file', 'ctx_file'):
         ctx[f] = cf[f].format(ddhhmm, ctx['hostname']) if f in cf else f"{f}-{ddhhmm}"
 
     job_dir = ctx['job_dir']
     os.makedirs(job_dir, exist_ok=True)
 
+    ctx['db_file'] = os.path.abspath(cf['db_file']) if cf.get('db_file') else None  # before chdir to job_dir
+
     ctx['log'] = get_logger(__name__, os.path.join(job_dir, ctx['log_file']))
     ctx['log'].setLevel(logging.DEBUG if ctx['debug'] else logging.INFO if ctx['verbose'] else logging.WARNING)
 
@@ -150,6 +180,10 @@ def init():
     ctx['log'].info(f"verbose = {ctx['verbose']}, debug = {ctx['debug']}")
 
     ctx['timestamps'] = []
+    ctx['dp_windows'] = []  # resource-monitor window per DP sample, in the unit of the command
+    ctx['dp_last_sample'] = None
+    ctx['blocks'] = []  # (cli set, iteration, timestamp, command) of each output in order
+    ctx['block'] = ctx['last_sent'] = (-1, 0, start_time, "")
     ctx['metrics'] = {}
 
     if 'dp_name_default' in dp and dp['dp_name_default'] == 'dp':
@@ -186,19 +220,31 @@ def send_cli(interact, cli_idx):
                 if c_len > 2:
                     timeout = c_[2]
 
+            is_dp = re.search(dp['command'], command) is not None
+
             for _ in range(count):  # repeat_count of each command line
                 if timeout > 0:
                     interact.expect([prompt], timeout=timeout)
-                interact.send(command)
-
-                match = re.search(dp['command'], command)
-                if match is not None:
-                    ctx['timestamps'].append(datetime.now())
+                    ctx['block'] = ctx['last_sent']  # output captured by expect is from the last command sent
+
+                command_ = command
+                if is_dp:
+                    command_ = dp_window_command(command)
+                    if command_ != command:
+                        ctx['log'].info(f"c = {command_}")
+                interact.send(command_)
+                ctx['last_sent'] = (cli_idx, i, datetime.now(), command_.strip())
+                if is_dp:
+                    ctx['timestamps'].append(ctx['last_sent'][2])
 
                 o = interact.current_output_clean
                 o = o.replace('\x00', '')
                 o = re.sub(r'\x1b\[[0-9;]*[A-Za-z]', '', o)
                 output.append(o)  # output.append(interact.current_output_clean)
+                ctx['blocks'].append(ctx['block'])
+
+                if ctx['timestamps'] and re.search(dp['cpu_load'], o):  # output of the previous DP command
+                    ctx['dp_last_sample'] = ctx['timestamps'][-1]
 
         now = datetime.now()
         elapsed = int((now - ctx['start_time']).total_seconds())
@@ -217,6 +263,34 @@ def send_cli(interact, cli_idx):
     return output
 
 
+def dp_window_command(command):
+    # size the resource-monitor window from the time elapsed since the last successful DP sample
+
+    window = cf['time_interval']
+
+    # only commands of the dp['window_command'] form resized, other resource-monitor commands sent as configured
+
+    window_re = re.escape(dp.get('window_command', '')).replace(r'\{0\}', r'(second|minute)').replace(r'\{1\}', r'\d+')
+
+    if not dp.get('window_adaptive') or not re.fullmatch(window_re, command.strip()):
+        ctx['dp_windows'].append(window)
+        return command
+
+    last = ctx['dp_last_sample']
+    elapsed = window if last is None else (datetime.now() - last).total_seconds()
+
+    skip = 1 if dp['skip_first_row'] else 0  # the first (incomplete) row is skipped by analyze_dp()
+
+    unit, window = 'second', math.ceil(elapsed) + skip
+    if window > dp['window_max']:  # not covered in seconds, e.g. long intervals or overruns
+        unit, window = 'minute', math.ceil(elapsed / 60) + skip
+    window = min(dp['window_max'], max(1, window))  # bounded by the device limit
+
+    ctx['dp_windows'].append(window)
+
+    return dp['window_command'].format(unit, window)
+
+
 def collect_data():
     output = []
 
@@ -279,17 +353,33 @@ def write_files(data, stats=None):
         ctx['log'].info(f"file {file} saved")
 
     file = ctx['cli_file']
-    with open(file, 'a') as f:
-        f.write("\n".join(data))
-        ctx['log'].info(f"file {file} saved")
+    cli_log_write(file, ctx['blocks'], data, markers=cf.get('cli_log_markers', False))  # index in cli-*.log.idx.json
+    ctx['log'].info(f"file {file} saved")
 
     if stats is not None:
+        if cf.get('ts_file'):  # samples in the compact store, summary only in the json
+            file = ctx['ts_file']
+            ts_write(file, stats)
+            ctx['log'].info(f"file {file} saved")
+            stats = {key: {k: v for k, v in s.items() if k != 'val'} for key, s in stats.items()}
+
         file = ctx['sta_file']
         with open(file, 'a') as f:
             f.write(json.dumps(stats, indent=2, default=str))
             ctx['log'].info(f"file {file} saved")
 
 
+def ingest_db():
+    if not ctx['db_file']:
+        return
+
+    conn = db_connect(ctx['db_file'])
+    job = db_ingest_job(conn, os.getcwd(), case=cf.get('case'), host=ctx['hostname'])
+    conn.close()
+
+    ctx['log'].info(f"job {job} ingested into {ctx['db_file']}")
+
+
 def get_joke():
     try:
         import pyjokes
@@ -305,7 +395,7 @@ def cleanup():
 
     if ctx['verbose']:
         for key, val in ctx.items():
-            if key not in ('log_buf', 'dp_output', 'pkey'):
+            if key not in ('log_buf', 'dp_output', 'pkey', 'blocks'):
                 ctx['log'].info(f"ctx['{key}']: {val}")
         for key, val in ctx['dp_output'].items():
             if isinstance(val, dict):
@@ -321,6 +411,8 @@ def cleanup():
 
     get_joke()
 
+    del ctx['blocks']  # indexed by the marker lines in cli-*.log
+
     file = ctx['ctx_file']
     for key, val in ctx.items():
         if isinstance(val, dict):
@@ -343,55 +435,82 @@ def analyze(data):
     ctx['log'].info(f"analyzing data..")
 
     output = {}   # stats
-    results = {}  # results extracted from data
+    results = {}  # results extracted from data, {metric: {(cli set, iteration): (values, timestamp)}}
 
-    for metric, pat_list in metrics.items():
-        results[metric] = []
-        if isinstance(pat_list, tuple):
-            pattern = pat_list[0]
-        else:
-            pattern = pat_list
+    # each output is keyed by the iteration of the command it came from (ctx['blocks']), so a metric
+    # missing from an iteration leaves a gap and a repeated match (e.g. outputs of timeout 0) is not another sample
+
+    blocks = ctx['blocks']
+    iterations = {}  # (cli set, iteration): timestamp of its first command, in order
+    for block in blocks:
+        iterations.setdefault(block[:2], block[2])
+
+    for metric, metric_cf in metrics.items():
+        results[metric] = {}
+        pattern = metric_spec(metric_cf)[0]
         for i, text in enumerate(data):
             match = re.search(pattern, text)
             if match:
                 values = list(match.groups())
-                results[metric].append(values)
-                ctx['log'].debug(f"match {metric} values {values}")
+                key = blocks[i][:2]
+                if key in results[metric]:
+                    ctx['log'].debug(f"match {metric} values {values} ignored, already matched in {key}")
+                else:
+                    results[metric][key] = (values, blocks[i][2])
+                    ctx['log'].debug(f"match {metric} values {values} in {key}")
             ctx['log'].debug(f"{i} - text = {text}")
             ctx['log'].debug("-" * 80)
         if len(results[metric]) == 0:  # delete empty matches from the results
             del results[metric]
 
+    keys = [key for key in iterations if any(key in r for r in results.values())]  # rows of all metrics
+    rows = {key: row for row, key in enumerate(keys)}
+    timestamps = [iterations[key] for key in keys]
+    t = np.array([ts.timestamp() for ts in timestamps])  # seconds
+
+    ctx['log'].info(f"{len(keys)} samples from {len(iterations)} iterations")
+
     np_dict = {}
-    for metric, val_list in results.items():
-        val_np = np.array(val_list, dtype=float)
+    for metric, samples in results.items():
+        k = len(next(iter(samples.values()))[0])
+        val_np = np.full((len(keys), k), np.nan)  # NaN for no sample
+        t_metric = np.full(len(keys), np.nan)  # time of the command of each sample
+        for key, (values, timestamp) in samples.items():
+            val_np[rows[key]] = np.array(values, dtype=float)
+            t_metric[rows[key]] = timestamp.timestamp()
+        if len(samples) < len(keys):
+            ctx['log'].info(f"metric {metric}: {len(keys) - len(samples)} of {len(keys)} samples missing")
         if ctx['debug']:
             print(val_np)
         np_dict[metric] = val_np
         ctx['metrics'][metric] = metrics[metric]
 
-    for metric2, metric_cf in metrics2.items():
+        metric_cf = metrics[metric]
+        if metric_spec(metric_cf)[3] == 'counter':  # deltas and rates from the cumulative values
+            delta, rate = counter_delta(val_np, t_metric, metric_cf.get('wrap', 2 ** 64))
+            for suffix, val_np_ in (('delta', delta), ('rate', rate)):
+                np_dict[f"{metric}_{suffix}"] = val_np_
+                ctx['metrics'][f"{metric}_{suffix}"] = metric_cf
+
+    results = metrics2_eval(ctx['metrics2'], np_dict)
+
+    for metric2, metric_cf in metrics2.items():  # in the order of metrics2
         metric = metric2 if metric2 not in metrics else f"{metric2}_2"
-        expr = metric_cf if not isinstance(metric_cf, tuple) else metric_cf[0]
-        try:
-            with np.errstate(divide='raise', invalid='raise', over='raise'):
-                val_np = eval(expr, {"__builtins__": None}, {**np_dict, 'np': np})
-                if val_np.ndim == 1:
-                    val_np = np.asarray(val_np).reshape(-1, 1)  # (T,) reshaped to (T, 1)
-        except Exception as e:
-            ctx['log'].warning(f"{metric} failed: '{expr}': {str(e)}")
-            continue
-        np_dict[metric] = val_np
-        ctx['metrics'][metric] = metrics2[metric2]
+        if metric in results:
+            np_dict[metric] = results[metric]
+            ctx['metrics'][metric] = metric_cf
 
     for key, val_np in np_dict.items():
-        s = {
-            'min': np.min(val_np, axis=0).tolist(),
-            'max': np.max(val_np, axis=0).tolist(),
-            'ave': np.mean(val_np, axis=0).tolist(),
-            'cnt': int(val_np.shape[0]),
-            'val': [(ctx['timestamps'][i], val_np[i].tolist()) for i in range(len(ctx['timestamps']))]
-        }
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN columns
+            s = {
+                'min': np.nanmin(val_np, axis=0).tolist(),
+                'max': np.nanmax(val_np, axis=0).tolist(),
+                'ave': np.nanmean(val_np, axis=0).tolist(),
+                'cnt': int((~np.isnan(val_np).all(axis=1)).sum()),  # samples captured
+            }
+        s.update(stats_distribution(key, val_np, t))
+        s['val'] = [(timestamps[i], val_np[i].tolist()) for i in range(len(timestamps))]
         output[key] = s
 
     if ctx['debug']:
@@ -401,14 +520,192 @@ def analyze(data):
     return output
 
 
+def metric_spec(metric_cf):
+    # (regex or expression, legends, k, type) of a metric in metrics or metrics2, in any of the forms
+    #
+    # regex
+    # (regex, legends) or (regex, legends, k)
+    # {'regex': regex, 'legends': legends, 'k': k, 'type': 'counter', 'wrap': 2 ** 32}
+
+    if isinstance(metric_cf, dict):
+        return metric_cf['regex'], metric_cf.get('legends'), metric_cf.get('k', 0), metric_cf.get('type', 'gauge')
+    if isinstance(metric_cf, tuple):
+        return metric_cf[0], metric_cf[1], metric_cf[2] if len(metric_cf) > 2 else 0, 'gauge'
+    return metric_cf, None, 0, 'gauge'
+
+
+def counter_delta(val_np, t, wrap=2 ** 64):
+    # per-sample deltas and per-second rates of cumulative counters (T, k) at times t (seconds)
+    # NaN for the first sample and for gaps, the delta over a gap given to the sample after it
+    # a decrease is a wrap if the previous value was in the upper half of the counter range, otherwise a reset
+
+    delta = np.full(val_np.shape, np.nan)
+    rate = np.full(val_np.shape, np.nan)
+
+    valid = ~np.isnan(val_np).any(axis=1) & ~np.isnan(t)
+    values, t = val_np[valid], t[valid]
+    if len(values) < 2:
+        return delta, rate
+
+    diff = np.diff(values, axis=0)
+    previous = values[:-1]
+
+    wrapped = (diff < 0) & (previous >= wrap / 2)
+    reset = (diff < 0) & ~wrapped
+    diff = np.where(wrapped, diff + wrap, diff)
+    diff = np.where(reset, values[1:], diff)  # counted from 0 after the reset
+
+    index = np.flatnonzero(valid)[1:]
+    delta[index] = diff
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate[index] = diff / np.diff(t).reshape(-1, 1)
+
+    return delta, rate
+
+
+def metrics2_names(tree):
+    # names in an expression, ValueError for anything but arithmetic, indexing and np.<function> calls
+
+    names = set()
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            func = node.func
+            if not (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == 'np'):
+                raise ValueError(f"call '{ast.unparse(func)}' not allowed")
+        elif isinstance(node, ast.Attribute):
+            if not (isinstance(node.value, ast.Name) and node.value.id == 'np' and node.attr in METRICS2_FUNCTIONS):
+                raise ValueError(f"'{ast.unparse(node)}' not allowed")
+        elif isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float)) and node.value is not None:
+                raise ValueError(f"constant {node.value!r} not allowed")
+        elif not isinstance(node, METRICS2_NODES):
+            raise ValueError(f"'{ast.unparse(node)}' not allowed")
+        if isinstance(node, ast.Name) and node.id != 'np':
+            names.add(node.id)
+
+    return names
+
+
+def metrics2_eval_code(code, env):
+    with np.errstate(all='ignore'):
+        val_np = np.array(eval(code, {"__builtins__": None}, env), dtype=float)
+    if val_np.ndim == 1:
+        val_np = val_np.reshape(-1, 1)  # (T,) reshaped to (T, 1)
+    if val_np.ndim != 2:
+        raise ValueError(f"shape {val_np.shape} not (T, k)")
+    return val_np
+
+
+def metrics2_eval(compiled, np_dict):
+    # {metric: (T, k)} of the compiled metrics2 in dependency order, each result available to the later ones
+    # NaN where a value is undefined (e.g. division by zero), a metric skipped if an input is missing
+
+    env = {'np': np, **np_dict}
+    output = {}
+
+    for metric, (metric2, code, names) in compiled.items():
+        missing = [name for name in names if name not in env]
+        if missing:
+            ctx['log'].warning(f"{metric} skipped: {missing} not available")
+            continue
+        try:
+            val_np = metrics2_eval_code(code, env)
+            val_np[~np.isfinite(val_np)] = np.nan
+        except Exception as e:
+            ctx['log'].warning(f"{metric} failed: '{metric_spec(metrics2[metric2])[0]}': {str(e)}")
+            continue
+        env[metric] = output[metric] = val_np
+
+    return output
+
+
+def metrics2_compile():
+    # metrics2 parsed once into code in dependency order, checked before collection on samples of ones
+    # returns ({metric: (metrics2 key, code, names)}, errors)
+
+    k = {}  # values per sample of each metric
+    for metric, metric_cf in metrics.items():
+        pattern, _, _, metric_type = metric_spec(metric_cf)
+        k[metric] = max(re.compile(pattern).groups, 1)
+        if metric_type == 'counter':
+            k[f"{metric}_delta"] = k[f"{metric}_rate"] = k[metric]
+
+    parsed, errors = {}, []
+
+    for metric2, metric_cf in metrics2.items():
+        metric = metric2 if metric2 not in metrics else f"{metric2}_2"
+        expr = metric_spec(metric_cf)[0]
+        try:
+            tree = ast.parse(expr, mode='eval')
+            parsed[metric] = (metric2, tree, metrics2_names(tree))
+        except (SyntaxError, ValueError) as e:
+            errors.append(f"{metric}: '{expr}': {str(e)}")
+
+    graph = {}
+    for metric, (metric2, tree, names) in parsed.items():
+        unknown = sorted(names - parsed.keys() - k.keys())
+        if unknown:
+            errors.append(f"{metric}: unknown {unknown}")
+        graph[metric] = names & parsed.keys()
+
+    try:
+        order = list(TopologicalSorter(graph).static_order())
+    except CycleError as e:
+        errors.append(f"circular reference: {' -> '.join(e.args[1])}")
+        order = []
+
+    compiled = {}
+    for metric in order:
+        metric2, tree, names = parsed[metric]
+        compiled[metric] = (metric2, compile(tree, f"<metrics2 {metric}>", 'eval'), sorted(names))
+
+    if not errors:  # dry run for shapes and indexes
+        env = {'np': np, **{metric: np.ones((3, n)) for metric, n in k.items()}}
+        for metric, (metric2, code, names) in compiled.items():
+            try:
+                env[metric] = metrics2_eval_code(code, env)
+            except Exception as e:
+                errors.append(f"{metric}: '{metric_spec(metrics2[metric2])[0]}': {str(e)}")
+
+    return compiled, errors
+
+
+def stats_distribution(metric, val_np, t):
+    # percentiles and std of each value, and time above cf['sta_thresholds']
+    # samples paired with the timestamps in t (seconds) by position
+
+    s = {}
+
+    percentiles = cf.get('sta_percentiles', [50, 90, 95, 99])
+    thresholds = cf.get('sta_thresholds', {})
+
+    with np.errstate(all='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN columns
+        q = np.nanpercentile(val_np, percentiles, axis=0)
+        for p, values in zip(percentiles, q):
+            s[f"p{p}"] = values.tolist()
+        s['std'] = np.nanstd(val_np, axis=0).tolist()
+
+        n = min(len(val_np), len(t))
+
+        if metric in thresholds and n > 0:
+            s['above'] = time_above(t[:n], val_np[:n], thresholds[metric]).tolist()  # seconds
+
+    return s
+
+
 def analyze_dp(data):
     ctx['log'].info(f"analyzing DP data..")
 
     output = {}
     dp_name = dp['dp_name_default']
-    t, timestamp, s, seconds = 0, None, 0, None
+    t, timestamp, s, seconds, step = 0, None, 0, None, timedelta(seconds=1)
+
+    for k, text in enumerate(data):
+        if k < len(ctx['blocks']) and not re.search(dp['command'], ctx['blocks'][k][3]):
+            continue  # not a resource-monitor block
 
-    for text in data:
         found = None
         lines = text.split('\n')
         i, n = 0, len(lines)
@@ -425,7 +722,10 @@ def analyze_dp(data):
                 match = re.search(dp[r], line)
                 if match:
                     found, section = True, r
-                    seconds = min(cf['time_interval'], int(match.group(1)))  # seconds = number of data rows
+                    window = ctx['dp_windows'][t] if t < len(ctx['dp_windows']) else cf['time_interval']
+                    seconds = min(window, int(match.group(1)))  # seconds = number of data rows
+                    unit = match.group(2) if match.lastindex and match.lastindex > 1 else 'second'
+                    step = timedelta(minutes=1) if unit == 'minute' else timedelta(seconds=1)
                     break
             if not section:
                 continue
@@ -433,24 +733,38 @@ def analyze_dp(data):
             ctx['log'].info(f"t {t}, dp_name {dp_name}, section {section}, seconds {seconds}")
 
             if section == 'res_util':
-                for util, hdr_str in dp['resources'].items():  # ['se', 'pb', 'pd', 'sw'] in order
-                    while i < n:
-                        line = lines[i]
-                        i += 1
-                        if line.startswith(hdr_str):
-                            timestamp = ctx['timestamps'][t]
-                            s = seconds
-                            continue
-                        values = line.split()
-                        if not values:
-                            break  # empty line indicates end of section
-                        for value in values:
-                            if s <= 0:
-                                break  # values outside time window ignored
+                # resource headers in any order, at either granularity, e.g. 'session:' or 'session (average):'
+                # the first header of a resource taken, a repeated one (e.g. maximum after average) ignored
+                util, seen = None, set()
+                while i < n:
+                    line = lines[i]
+                    i += 1
+                    values = line.split()
+                    if not values:
+                        continue  # empty lines between resources
+                    if any(re.search(dp[r], line) for r in ('dp_name', 'cpu_load', 'res_util')):
+                        i -= 1  # next DP or section, read again by the outer loop
+                        break
+                    header = next((r for r, hdr_re in dp['resources'].items() if re.match(hdr_re, line.strip())), None)
+                    if header is not None:
+                        util = header if header not in seen else None
+                        seen.add(header)
+                        timestamp = ctx['timestamps'][t]
+                        s = seconds
+                        continue
+                    if line.strip().endswith(':'):
+                        util = None  # resources not in dp['resources'] ignored
+                        continue
+                    if util is None or not all(value.isdigit() or value == '*' for value in values):
+                        continue
+                    for value in values:
+                        if s <= 0:
+                            break  # values outside time window ignored
+                        if value != '*':
                             output[dp_name][util].append((timestamp, value))
-                            timestamp -= timedelta(seconds=1)
-                            s -= 1
-                    ctx['log'].info(f"dp_name {dp_name}, util {util}, s {s}, n_values {len(output[dp_name][util])}")
+                        timestamp -= step
+                        s -= 1
+                ctx['log'].info(f"dp_name {dp_name}, resources {sorted(seen)}")
                 continue
 
             if dp_name not in output:
@@ -477,6 +791,10 @@ def analyze_dp(data):
                     break  # empty line indicates end of section
                 if s <= 0:
                     continue  # value lines outside time window ignored until next core header line with s reset
+                if not values[0].isdigit() and values[0] != '*':  # labelled rows at minute granularity (avg, max)
+                    if values[0] != dp['minute_row']:
+                        continue
+                    values = values[1:]
                 is_first_row = (s == seconds)
                 if is_first_row and dp['skip_first_row']:
                     pass  # first value line ignored (usually with some zeros)
@@ -492,13 +810,16 @@ def analyze_dp(data):
                                 output[dp_name]['_'][timestamp] = []
                             output[dp_name]['_'][timestamp].append(value)
                     ctx['log'].info(f"dp_name {dp_name}, cores {cores}, s {s}, n_values {len(output[dp_name]['_'][timestamp])}")
-                timestamp -= timedelta(seconds=1)
+                timestamp -= step
                 s -= 1
         if found:
             t += 1  # next timestamp when the DP command was seen again
         ctx['log'].info("next text")
 
     for dp_name in output.keys():
+        for util, hdr_re in dp['resources'].items():
+            if len(output[dp_name][util]) == 0:
+                ctx['log'].warning(f"DP {dp_name}: no rows of resource '{util}' ({hdr_re})")
         values = next(iter(output[dp_name]['_'].values()))
         n = len(values)
         ctx['log'].info(f"DP {dp_name}: {n} cores")
@@ -512,17 +833,164 @@ def analyze_dp(data):
     return output
 
 
+def downsample_minmax(y, n):
+    # indexes of the min and max of y in each of n/2 buckets
+
+    edges = np.linspace(0, len(y), max(n // 2, 1) + 1).astype(int)
+    bucket = np.repeat(np.arange(len(edges) - 1), np.diff(edges))
+    order = np.lexsort((y, bucket))  # by bucket then value
+    first = edges[:-1][np.diff(edges) > 0]
+    last = edges[1:][np.diff(edges) > 0] - 1
+
+    return np.concatenate([order[first], order[last]])
+
+
+def downsample_lttb(x, y, n):
+    # indexes picked by largest-triangle-three-buckets, the first and the last samples included
+
+    edges = np.linspace(1, len(y) - 1, max(n - 2, 1) + 1).astype(int)
+    indexes = [0]
+
+    for b in range(len(edges) - 1):
+        a, c = edges[b], edges[b + 1]
+        if c <= a:
+            continue
+        c_next = edges[b + 2] if b + 2 < len(edges) else len(y)
+        x_next, y_next = x[c:c_next].mean() if c_next > c else x[-1], y[c:c_next].mean() if c_next > c else y[-1]
+        x_prev, y_prev = x[indexes[-1]], y[indexes[-1]]
+        area = np.abs((x_prev - x_next) * (y[a:c] - y_prev) - (x_prev - x[a:c]) * (y_next - y_prev))
+        indexes.append(a + int(np.argmax(area)))
+
+    indexes.append(len(y) - 1)
+
+    return np.array(indexes)
+
+
+def downsample(x, y, n, method='minmax'):
+    # about n samples of y (T,) or (T, k) against x for plotting, peaks of every column kept
+    # minmax keeps the min and max of each bucket; lttb keeps the shape, plus the min and max of each column
+
+    if len(x) <= n:
+        return x, y
+
+    columns = y.reshape(len(y), -1).T
+    indexes = [[0, len(x) - 1]]  # full time range
+
+    for column in columns:
+        if method == 'lttb':
+            indexes.append(downsample_lttb(x, column, n))
+            indexes.append([np.argmin(column), np.argmax(column)])
+        else:
+            indexes.append(downsample_minmax(column, n))
+
+    indexes = np.unique(np.concatenate(indexes))
+
+    return x[indexes], y[indexes]
+
+
+def axes_lines(ax, n):
+    # lines of a reused axes updated in place if there are n of them, otherwise the axes cleared for a full draw
+
+    lines = ax.get_lines()
+    if len(lines) == n:
+        for collection in list(ax.collections):  # fills redrawn
+            collection.remove()
+        return lines
+
+    ax.cla()
+    return None
+
+
+def dp_draw(ax, title, curves, label="", fill=False):
+    lines = axes_lines(ax, len(curves))
+
+    for j, (core, (x, y)) in enumerate(curves.items()):
+        if lines is None:
+            ax.plot(x, y, label=f"{label}{core}")
+        else:
+            lines[j].set_data(x, y)
+            lines[j].set_label(f"{label}{core}")
+
+    if lines is not None:
+        ax.relim()
+
+    if fill:
+        for x, y in curves.values():
+            ax.fill_between(x, y, step='mid', alpha=0.4)  # , color='skyblue')
+
+    ax.set_title(title)
+
+    if lines is None:
+        # ax.set_xlabel('Time')
+        ax.set_ylabel('CPU load (%)')
+        ax.tick_params(axis='x', labelrotation=45)
+        ax.set_yticks(np.arange(0, 101, 20))
+        ax.set_ylim(0, 100)
+        ax.grid(which='both', linestyle='--', linewidth=0.4, alpha=0.4)
+    else:
+        ax.autoscale_view()
+
+    ax.legend()
+
+
+def dp_interp(x, y):
+    if 'interp' in dp and dp['interp'] == 'spline':
+        return make_interp_spline(x, y, k=3)
+    return PchipInterpolator(x, y)
+
+
+def dp_smooth(x, y, cores, t0):
+    # {core: (datetimes, values)} from the (time x core) matrix y, NaN where a core has no sample at the time
+    # cores sampled at all times are interpolated together, others on their own samples, cores without any skipped
+
+    curves = {}
+
+    to_datetime = lambda x_: t0 + pd.to_timedelta(x_, unit='s')
+
+    if dp.get('downsample') and len(x) > PLOT_POINTS:  # long runs, plotted as sampled
+        for j, core in enumerate(cores):
+            valid = ~np.isnan(y[:, j])
+            if valid.any():
+                x_core, y_core = downsample(x[valid], y[valid, j], dp['downsample_points'], dp['downsample'])
+                curves[core] = (to_datetime(x_core), y_core)
+        return curves
+
+    full = ~np.isnan(y).any(axis=0) & (len(x) > 1)
+
+    # samples included in the points interpolated, so the curves pass through every peak
+
+    if full.any():
+        x_smooth = np.union1d(np.linspace(x.min(), x.max(), PLOT_POINTS), x)
+        x_smooth_datetime = to_datetime(x_smooth)
+        y_smooth = dp_interp(x, y[:, full])(x_smooth)
+        for j, y_core in zip(np.flatnonzero(full), y_smooth.T):
+            curves[cores[j]] = (x_smooth_datetime, y_core)
+
+    for j in np.flatnonzero(~full):
+        valid = ~np.isnan(y[:, j])
+        x_core = x[valid]
+        if len(x_core) < 2:  # a single sample plotted as is
+            if len(x_core) == 1:
+                curves[cores[j]] = (to_datetime(x_core), y[valid, j])
+            continue
+        x_smooth = np.union1d(np.linspace(x_core.min(), x_core.max(), PLOT_POINTS), x_core)
+        curves[cores[j]] = (to_datetime(x_smooth), dp_interp(x_core, y[valid, j])(x_smooth))
+
+    return curves
+
+
 def plot_dp(data):
     ctx['log'].info(f"plotting DP..")
 
     df_list = []
-    plot_groups = {'0': []}
-    watermark = []
+    plots, watermark = [], []
+    heatmaps, aggregates, summary = {}, {}, {}
 
     plt.style.use('default')
 
+    fig, ax = plt.subplots(figsize=(12, 8))  # reused across DPs and core groups
+
     for dp_name in data.keys():
-        plot_groups[dp_name] = []
         data_dp = data[dp_name]
 
         core_max = 0
@@ -547,7 +1015,38 @@ def plot_dp(data):
 
         ctx['log'].info(f"DP {dp_name}: core_groups: {core_groups}")
 
+        cores = [core for core_group in core_groups for core in core_group]
+        df = pd.DataFrame(
+            [(timestamp, load, k) for k, core in enumerate(cores) for timestamp, load in data_dp[core]],
+            columns=['timestamp', 'load', 'k']
+        )
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df = df.sort_values(by=['k', 'timestamp'], kind='stable')
+        df['dp'] = dp_name
+        df['core'] = np.array(cores, dtype=object)[df['k']]
+        df_list.append(df.drop(columns='k'))
+
+        # (time x core) matrix of the DP, interpolated at once for all core groups
+
+        matrix = df.drop_duplicates(['timestamp', 'k'], keep='last').pivot(index='timestamp', columns='k', values='load')
+        matrix = matrix.reindex(columns=range(len(cores)))  # columns by position in cores, NaN for cores without rows
+        t0 = matrix.index.min()
+        x = ((matrix.index - t0) / np.timedelta64(1, 's')).to_numpy()
+        y = matrix.to_numpy(dtype=float)
+        curves = dp_smooth(x, y, cores, t0)
+
+        aggregates[dp_name] = {a: curves[a] for a in dp['aggregate'] if a in curves}
+        summary[dp_name] = {
+            core: dp_summary(x, y[:, k]) for k, core in enumerate(cores)
+            if core in dp['aggregate'] and not np.isnan(y[:, k]).all()
+        }
+
+        numeric = [k for k, core in enumerate(cores) if core.isdigit()]
+        if len(numeric) > 0:
+            heatmaps[dp_name] = (matrix.index, y[:, numeric], [cores[k] for k in numeric])
+
         for i, core_group in enumerate(core_groups):
+            core_group = [core for core in core_group if core in curves]  # cores without samples not drawn
             if len(core_group) == 0:
                 continue
 
@@ -561,60 +1060,140 @@ def plot_dp(data):
                 label = "Core "
                 title = f"DP Utilization ({dp_name}) - Group {i}"
 
-            plt.figure(figsize=(12, 8))
+            draw = partial(dp_draw, title=title, curves={core: curves[core] for core in core_group}, label=label, fill=(i == 0))
 
-            for core in core_group:
-                data_core = data_dp[core]
-                df = pd.DataFrame(data_core, columns=['timestamp', 'load'])
-                df['timestamp'] = pd.to_datetime(df['timestamp'])
-                df = df.sort_values(by='timestamp')
+            plot_file = dp['plot_file'].format(dp_name, i)
+            if i == 0:
+                plots.append(draw)
+                watermark.append(dp_name)
 
-                df['dp'] = dp_name
-                df['core'] = core
-                df_list.append(df)
+            draw(ax)
+            fig.tight_layout()
+            plot_save(fig, plot_file)
 
-                x = (df['timestamp'] - df['timestamp'].min()) / np.timedelta64(1, 's')
-                y = df['load']
+    plt.close(fig)
 
-                x_smooth = np.linspace(x.min(), x.max(), 300)
-                x_smooth_datetime = pd.to_datetime(df['timestamp'].min()) + pd.to_timedelta(x_smooth, unit='s')
+    pd.concat(df_list).to_csv(dp['csv_file'], index=False)
+    ctx['log'].info(f"file {dp['csv_file']} saved")
 
-                if 'interp' in dp and dp['interp'] == 'spline':
-                    spline = make_interp_spline(x, y, k=3)
-                    y_smooth = spline(x_smooth)
-                else:
-                    pchip = PchipInterpolator(x, y)
-                    y_smooth = pchip(x_smooth)
+    file = dp.get('summary_file')
+    if file:
+        with open(file, "w") as f:
+            f.write(json.dumps(summary, indent=2))
+        ctx['log'].info(f"file {file} saved")
 
-                plt.plot(x_smooth_datetime, y_smooth, label=f"{label}{core}")
-                if i == 0:
-                    plt.fill_between(x_smooth_datetime, y_smooth, step='mid', alpha=0.4)  # , color='skyblue')
+    if dp.get('heatmap_file') and len(heatmaps) > 0:
+        plot_dp_heatmap(heatmaps)
 
-            plot_file = dp['plot_file'].format(dp_name, i)
-            plot_groups[dp_name].append(plot_file)
-            if i == 0:
-                plot_groups['0'].append(plot_file)
-                watermark.append(dp_name)
+    if dp.get('compare_file') and len(aggregates) > 1:
+        plot_dp_compare(aggregates)
 
-            plt.title(title)
+    combine_plots(plots, dp['plot_file_combined'], grid_size=dp['plot_grid_size'], watermark=watermark)
 
-            # plt.xlabel('Time')
-            plt.ylabel('CPU load (%)')
-            plt.xticks(rotation=45)
-            plt.yticks(np.arange(0, 101, 20))
-            plt.ylim(0, 100)
-            plt.grid(which='both', linestyle='--', linewidth=0.4, alpha=0.4)
-            plt.legend()
-            plt.tight_layout()
-            plt.savefig(plot_file)
-            plt.close()
 
-            ctx['log'].info(f"plot {plot_file} saved")
+def time_above(x, y, threshold):
+    # seconds of y (T,) or (T, k) above threshold, each sample held until the next one (the median step for the last)
 
-    pd.concat(df_list).to_csv(dp['csv_file'], index=False)
-    ctx['log'].info(f"file {dp['csv_file']} saved")
+    if len(x) == 0:
+        return np.zeros(y.shape[1:])
+    step = np.median(np.diff(x)) if len(x) > 1 else 0.0
+    dt = np.diff(x, append=x[-1] + step).reshape(-1, *([1] * (y.ndim - 1)))
+
+    return np.where(y > threshold, dt, 0.0).sum(axis=0)  # NaN not above
+
+
+def dp_summary(x, y):
+    # summary of a DP series y against x in seconds, NaN for no sample
+
+    valid = ~np.isnan(y)
+    x, y = x[valid], y[valid]
+    if len(y) == 0:
+        return {}
+
+    duration = x[-1] - x[0] + (np.median(np.diff(x)) if len(x) > 1 else 0.0)
+    above = float(time_above(x, y, dp.get('threshold', 80)))
+
+    return {
+        'mean': round(float(y.mean()), 2),
+        'p95': round(float(np.percentile(y, 95)), 2),
+        'max': round(float(y.max()), 2),
+        'cnt': int(len(y)),
+        'above': above,  # seconds above dp['threshold']
+        'above_pct': round(100 * above / duration, 2) if duration > 0 else 0.0,
+    }
 
-    combine_plots(plot_groups['0'], dp['plot_file_combined'], grid_size=dp['plot_grid_size'], watermark=watermark)
+
+def plot_dp_compare(aggregates):
+    # ave and max of all DPs overlaid, one axes per aggregate
+
+    names = [a for a in dp['aggregate'] if any(a in curves for curves in aggregates.values())]
+
+    fig, axs = plt.subplots(len(names), 1, figsize=(12, 4 * len(names)), sharex=True, squeeze=False)
+
+    for ax, a in zip(axs[:, 0], names):
+        if len(aggregates) > 10:
+            ax.set_prop_cycle(color=plt.get_cmap('tab20').colors)  # distinct colors for chassis DPs
+        for dp_name, curves in aggregates.items():
+            if a in curves:
+                ax.plot(*curves[a], label=dp_name, linewidth=1.0)
+        ax.axhline(dp.get('threshold', 80), color='red', linestyle='--', linewidth=0.8, alpha=0.6)
+        ax.set_title(f"DP Utilization ({a}) of {len(aggregates)} DPs")
+        ax.set_ylabel('CPU load (%)')
+        ax.set_yticks(np.arange(0, 101, 20))
+        ax.set_ylim(0, 100)
+        ax.grid(which='both', linestyle='--', linewidth=0.4, alpha=0.4)
+        ax.legend(ncol=max(1, len(aggregates) // 8), fontsize='small', loc='upper left')
+
+    axs[-1, 0].tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    plot_save(fig, dp['compare_file'])
+    plt.close(fig)
+
+
+def plot_dp_heatmap(heatmaps):
+    # all cores of all DPs in one image, time on x and core on y, each cell the max load of the time bin
+
+    t_min = min(t.min() for t, _, _ in heatmaps.values())
+    t_max = max(t.max() for t, _, _ in heatmaps.values())
+    span = max((t_max - t_min) / np.timedelta64(1, 's'), 1)
+    n_bins = int(min(max(len(t) for t, _, _ in heatmaps.values()), dp['heatmap_bins']))
+
+    rows, ticks, labels, bounds = [], [], [], []
+
+    for dp_name, (t, y, cores) in heatmaps.items():
+        bins = np.minimum(((t - t_min) / np.timedelta64(1, 's') / span * n_bins).to_numpy().astype(int), n_bins - 1)
+        image = np.full((len(cores), n_bins), np.nan)
+        np.fmax.at(image, (slice(None), bins), y.T)  # NaN ignored
+        ticks.append(sum(len(r) for r in rows) + len(cores) / 2)
+        labels.append(dp_name)
+        rows.append(image)
+        bounds.append(sum(len(r) for r in rows))
+
+    image = np.ma.masked_invalid(np.vstack(rows))
+    n_rows = image.shape[0]
+
+    fig, ax = plt.subplots(figsize=(12, min(max(3 + n_rows * 0.04, 4), 24)))
+
+    im = ax.imshow(
+        image,
+        aspect='auto',
+        interpolation='nearest',
+        cmap=dp['heatmap_cmap'],
+        vmin=0, vmax=100,
+        extent=(mdates.date2num(t_min), mdates.date2num(t_max), n_rows, 0),
+    )
+    for bound in bounds[:-1]:
+        ax.axhline(bound, color='white', linewidth=0.8)
+
+    ax.xaxis_date()
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+    ax.set_yticks(ticks)
+    ax.set_yticklabels(labels)
+    ax.set_title(f"DP Utilization by core ({n_rows} cores)")
+    fig.colorbar(im, ax=ax, label='CPU load (%)', pad=0.01)
+    fig.tight_layout()
+    plot_save(fig, dp['heatmap_file'])
+    plt.close(fig)
 
 
 def read_conf(cf_path):
@@ -628,13 +1207,69 @@ def read_conf(cf_path):
     spec.loader.exec_module(module)
 
 
+def stats_draw(ax, i, metric, x, y, legends, k, color):
+    lines = axes_lines(ax, y.shape[1])
+
+    for j in range(y.shape[1]):
+        highlight = (j == k)
+        linestyle = '-'  # if highlight else '--'
+        alpha = 0.95 if highlight else 0.65
+        linewidth = 1.1 if highlight else 0.9  # (2.2, 1.6)
+        zorder = 4 if highlight else 3
+
+        if lines is None:
+            ax.plot(
+                x, y[:, j],
+                linestyle=linestyle,
+                label=legends[j],
+                alpha=alpha,
+                linewidth=linewidth,
+                zorder=zorder
+            )
+        else:
+            lines[j].set_data(x, y[:, j])
+            lines[j].set(label=legends[j], alpha=alpha, linewidth=linewidth, zorder=zorder)
+
+    if lines is not None:
+        ax.relim()
+
+    ax.fill_between(
+        x, y[:, k],
+        color=color,
+        alpha=0.45,
+        zorder=1,
+    )
+
+    if lines is None:
+        ax.set_facecolor('#f8fafc')
+        ax.set_axisbelow(True)
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+        ax.set_xlabel("time")
+        ax.grid(which='both', color='#000000', linestyle='-', linewidth=0.5, alpha=0.06)
+    else:
+        ax.autoscale_view()
+
+    for label in ax.get_xticklabels():  # as autofmt_xdate() but per axes, also in grids
+        label.set_rotation(30)
+        label.set_horizontalalignment('right')
+
+    ax.set_ylabel(metric)
+    ax.set_title(f"Plot {i} - {metric}")
+    if y.shape[1] > 1:
+        ax.legend()
+    elif ax.get_legend() is not None:
+        ax.get_legend().remove()
+
+
 def plot_stats(stats):
     ctx['log'].info(f"plotting stats..")
 
     plt.style.use('seaborn-v0_8')  # 'ggplot')
     colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
 
-    plot_files, watermark = [], []
+    plots, watermark = [], []
+
+    fig, ax = plt.subplots(figsize=(10, 5))  # reused across metrics
 
     for i, (metric, metric_cf) in enumerate(ctx['metrics'].items()):
         if metric not in stats:  # i also skipped
@@ -648,77 +1283,60 @@ def plot_stats(stats):
         x = np.array([mdates.date2num(ts) for ts in timestamps])
         y = np.array(values, dtype=float)
 
-        x_smooth = np.linspace(x.min(), x.max(), 300)
+        valid = ~np.isnan(y).any(axis=1)  # e.g. the first delta of a counter
+        x, y = x[valid], y[valid]
+        if len(x) < 2:
+            ctx['log'].warning(f"metric = {metric}, {len(x)} sample(s) not plotted")
+            continue
 
-        color = colors[i % len(colors)]
+        if cf.get('plot_downsample') and len(x) > PLOT_POINTS:  # long runs, plotted as sampled
+            x_smooth, y_smooth = downsample(x, y, cf['plot_downsample_points'], cf['plot_downsample'])
+        else:
+            x_smooth = np.union1d(np.linspace(x.min(), x.max(), PLOT_POINTS), x)  # through every sample
+            y_smooth = np.column_stack([PchipInterpolator(x, y[:, j])(x_smooth) for j in range(y.shape[1])])
 
-        plt.figure(figsize=(10, 5))
+        color = colors[i % len(colors)]
 
         legends, k = [metric], 0
-        if isinstance(metric_cf, tuple) and y.shape[1] > 1:
-            legends = metric_cf[1]
-            if len(metric_cf) > 2:
-                k = metric_cf[2]
+        _, legends_cf, k_cf, _ = metric_spec(metric_cf)
+        if legends_cf is not None and y.shape[1] > 1:
+            legends, k = legends_cf, k_cf
         ctx['log'].info(f"metric = {metric}, legends = {legends}, k = {k}")
 
-        for j in range(y.shape[1]):
-            pchip = PchipInterpolator(x, y[:, j])
-            y_smooth = pchip(x_smooth)
+        draw = partial(stats_draw, i=i, metric=metric, x=x_smooth, y=y_smooth, legends=legends, k=k, color=color)
 
-            highlight = (j == k)
-            linestyle = '-'  # if highlight else '--'
-            alpha = 0.95 if highlight else 0.65
-            linewidth = 1.1 if highlight else 0.9  # (2.2, 1.6)
-            zorder = 4 if highlight else 3
+        draw(ax)
+        fig.tight_layout()
+        plot_save(fig, plot_file)
 
-            plt.plot(
-                x_smooth, y_smooth,
-                linestyle=linestyle,
-                label=legends[j],
-                alpha=alpha,
-                linewidth=linewidth,
-                zorder=zorder
-            )
+        plots.append(draw)
+        watermark.append(metric)
 
-            if highlight:
-                plt.fill_between(
-                    x_smooth, y_smooth,
-                    color=color,
-                    alpha=0.45,
-                    zorder=1,
-                )
+    plt.close(fig)
 
-        ax = plt.gca()
+    combine_plots(plots, cf['plot_file_combined'], grid_size=cf['plot_grid_size'], watermark=watermark)
 
-        ax.set_facecolor('#f8fafc')
-        ax.set_axisbelow(True)
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
-        plt.gcf().autofmt_xdate()
 
-        plt.xlabel("time")
-        plt.ylabel(metric)
-        plt.title(f"Plot {i} - {metric}")
-        if y.shape[1] > 1:
-            plt.legend()
+def plot_save(fig, plot_file):
+    # saved in each of cf['plot_formats'], the file name suffix replaced by the format
 
-        ax.grid(which='both', color='#000000', linestyle='-', linewidth=0.5, alpha=0.06)
+    plot_files = []
 
-        plt.tight_layout()
-        plt.savefig(plot_file)
-        plt.close()
+    for fmt in cf.get('plot_formats', ['png']):
+        file = str(Path(plot_file).with_suffix(f".{fmt}"))
+        fig.savefig(file, format=fmt)
+        plot_files.append(file)
+        ctx['log'].info(f"plot {file} saved")
 
-        ctx['log'].info(f"plot {plot_file} saved")
-
-        plot_files.append(plot_file)
-        watermark.append(metric)
-
-    combine_plots(plot_files, cf['plot_file_combined'], grid_size=cf['plot_grid_size'], watermark=watermark)
+    return plot_files
 
 
 def combine_plots(
         source, target, grid_size=(1,1), watermark=None,
         start=0, shift=0.0
 ):
+    # source of plot files, or of functions drawing a plot on given axes, which keep the grid in vector
+
     n_plots = len(source)
     n_rows, n_cols = grid_size
 
@@ -733,11 +1351,14 @@ def combine_plots(
         axs = axs.flatten()
         n = min(i + n_rows * n_cols, n_plots)
         for j in range(i, n):
-            plot_file = source[j]
-            image = plt.imread(plot_file)
             ax = axs[j-i]
-            ax.imshow(image)
-            ax.axis('off')
+            if callable(source[j]):
+                source[j](ax)
+            else:
+                plot_file = source[j]
+                image = plt.imread(plot_file)
+                ax.imshow(image)
+                ax.axis('off')
             if watermark:
                 label = watermark[j]
                 ax.text(
@@ -753,11 +1374,13 @@ def combine_plots(
         for j in range(n, i + n_rows * n_cols):
             axs[j-i].axis('off')
         plt.tight_layout()
-        plt.savefig(plot_file_combined)
+        if callable(source[i]):
+            plot_save(fig, plot_file_combined)
+        else:
+            plt.savefig(plot_file_combined)
+            ctx['log'].info(f"combined plot {plot_file_combined} saved")
         plt.close()
 
-        ctx['log'].info(f"combined plot {plot_file_combined} saved")
-
 
 def analyze_logs_traffic():
     if 'traffic_analysis' not in cf or not cf['traffic_analysis'] or not ctx['api_key']:
@@ -969,4 +1592,5 @@ if __name__ == '__main__':
     plot_dp(data_dp_)
     data_logs_ = analyze_logs_traffic()
     plot_logs_traffic(data_logs_)
+    ingest_db()
     cleanup()
@@ -0,0 +1,213 @@
+"""
+
+pan-os-cli v2.6 [20261019]
+
+Memory-mapped access to CLI output logs (cli-*.log) by command block
+
+by Terence LEE <telee.hk@gmail.com>
+
+https://github.com/telee0/pan-os_cli
+
+"""
+
+import json
+import mmap
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+
+# cli-*.log holds the command outputs joined by newlines as captured, with the blocks indexed in
+# cli-*.log.idx.json; optionally each output is preceded by a marker line, so the blocks can also be
+# found without the index
+#
+# #### [<cli set>_<iteration>] <timestamp> <command>
+
+MARKER = "#### [{0}_{1}] {2} {3}"
+MARKER_RE = re.compile(rb'^#### \[(-?\d+)_(\d+)\] (\S+) ?(.*?)\r?$', re.M)
+
+INDEX_SUFFIX = '.idx.json'
+
+# logs from earlier versions have no markers, blocks are found at the command echo lines instead,
+# from the prompt and the CLI sets in the config dump of the job
+
+CNF_FILE = 'cf-*.json'
+
+
+def cli_log_marker(block):
+    cli_idx, iteration, timestamp, command = block
+    ts = timestamp.isoformat() if isinstance(timestamp, datetime) else str(timestamp)
+    return MARKER.format(cli_idx, iteration, ts, command)
+
+
+def cli_log_index_file(file):
+    return f"{file}{INDEX_SUFFIX}"
+
+
+def cli_log_write_index(file, blocks):
+    stat = os.stat(file)
+    with open(cli_log_index_file(file), "w", encoding="utf-8") as f:
+        json.dump({'size': stat.st_size, 'mtime': stat.st_mtime, 'blocks': blocks}, f)
+
+
+def cli_log_write(file, blocks, data, markers=False):
+    # writes the outputs and the sidecar index at once, no rescan needed by readers
+    # without markers the log is the outputs joined by newlines, as written by earlier versions
+
+    index = cli_log_index(file) if os.path.exists(file) and os.path.getsize(file) > 0 else []
+
+    with open(file, "ab") as f:
+        offset = f.tell()
+        for k, (block, text) in enumerate(zip(blocks, data)):
+            if markers:
+                head = (cli_log_marker(block) + "\n").encode("utf-8", errors="replace")
+                body = (text + "\n").encode("utf-8", errors="replace")
+            else:
+                head = b"\n" if k > 0 else b""  # newline between outputs
+                body = text.encode("utf-8", errors="replace")
+            f.write(head)
+            f.write(body)
+            cli_idx, iteration, timestamp, command = block
+            index.append({
+                'set': cli_idx,
+                'iteration': iteration,
+                'timestamp': timestamp.isoformat() if isinstance(timestamp, datetime) else str(timestamp),
+                'command': command,
+                'offset': offset + len(head),
+                'length': len(body),
+            })
+            offset += len(head) + len(body)
+
+    cli_log_write_index(file, index)
+
+    return index
+
+
+def cli_log_echo_re(file):
+    # regex of the command echo lines, optionally after the prompt, None if the config dump is not found
+
+    cnf_file = next(Path(file).parent.glob(CNF_FILE), None)
+    if cnf_file is None:
+        return None
+
+    try:
+        with open(cnf_file, "r", encoding="utf-8") as f:
+            cnf = json.load(f)
+        prompt, cli = cnf['cf']['prompt'], cnf['cli']
+    except (OSError, ValueError, KeyError):
+        return None
+
+    commands = set()
+    for cli_set in cli:
+        if len(cli_set) == 2 and isinstance(cli_set[0], list) and isinstance(cli_set[1], int):
+            cli_set = cli_set[0]  # (cli list, iterations)
+        for c in cli_set:
+            c = c if isinstance(c, str) else c[0]  # (command_line, repeat_count, timeout)
+            if c.strip():
+                commands.add(c.strip())
+
+    if not commands:
+        return None
+
+    commands_re = "|".join(re.escape(c) for c in sorted(commands, key=len, reverse=True))
+
+    return re.compile(f"^(?:{prompt})?({commands_re})[ \t]*\r?$".encode(), re.M)
+
+
+def cli_log_entries(file, mm):
+    # yields the index entries of the log mapped in mm, in order as the blocks are found
+
+    size = len(mm)
+    entry = None
+
+    if MARKER_RE.match(mm):
+        for m in MARKER_RE.finditer(mm):
+            if entry is not None:
+                entry['length'] = max(0, m.start() - entry['offset'])
+                yield entry
+            entry = {
+                'set': int(m.group(1)),
+                'iteration': int(m.group(2)),
+                'timestamp': m.group(3).decode(),
+                'command': m.group(4).decode(errors="ignore"),
+                'offset': m.end() + 1,  # text after the marker line
+            }
+    else:  # logs from earlier versions, one block without a command if the echo lines are not known
+        echo_re = cli_log_echo_re(file)
+        entry = {'set': None, 'iteration': None, 'timestamp': None, 'command': None, 'offset': 0}
+        for m in echo_re.finditer(mm) if echo_re is not None else ():
+            entry['length'] = max(0, m.start() - entry['offset'])
+            if entry['length'] > 0 or entry['command'] is not None:
+                yield entry
+            entry = {
+                'set': None,
+                'iteration': None,
+                'timestamp': None,
+                'command': m.group(1).decode(errors="ignore"),
+                'offset': min(size, m.end() + 1),  # text after the echo line
+            }
+
+    if entry is not None:
+        entry['length'] = max(0, size - entry['offset'])
+        yield entry
+
+
+def cli_log_build_index(file):
+    if os.path.getsize(file) == 0:
+        return []
+
+    with open(file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return list(cli_log_entries(file, mm))
+
+
+def cli_log_index(file):
+    idx_file = cli_log_index_file(file)
+    stat = os.stat(file)
+
+    if os.path.exists(idx_file):  # written during collection or cached from an earlier scan
+        try:
+            with open(idx_file, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+            if cache['size'] == stat.st_size and cache['mtime'] == stat.st_mtime:
+                return cache['blocks']
+        except (OSError, ValueError, KeyError):
+            pass  # rebuilt below
+
+    blocks = cli_log_build_index(file)
+
+    try:
+        cli_log_write_index(file, blocks)
+    except OSError:
+        pass  # read-only location, index not cached
+
+    return blocks
+
+
+def cli_log_lines(file, commands=None, index=None):
+    # yields (entry, line) of the blocks with a command matching any of the regex in commands,
+    # read line by line from the map, blocks without a command (earlier logs) always yielded
+    # blocks found from the start of the map without an index, so a caller stopping early
+    # reads only the log up to that point, not the index of the whole run
+
+    patterns = None if commands is None else [re.compile(c) for c in commands]
+
+    if os.path.getsize(file) == 0:
+        return
+
+    with open(file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for entry in index if index is not None else cli_log_entries(file, mm):
+            command = entry['command']
+            if patterns is not None and command is not None:
+                if not any(p.search(command) for p in patterns):
+                    continue
+            end = entry['offset'] + entry['length']
+            mm.seek(entry['offset'])
+            while mm.tell() < end:
+                line = mm.readline()
+                if mm.tell() > end:
+                    line = line[:len(line) - (mm.tell() - end)]
+                yield entry, line.decode("utf-8", errors="ignore").rstrip("\r\n")
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,246 @@
+"""
+
+pan-os-cli v2.6 [20261019]
+
+Cross-job time-series database (SQLite) for trend queries
+
+by Terence LEE <telee.hk@gmail.com>
+
+https://github.com/telee0/pan-os_cli
+
+usage:
+
+    python pan_db.py -d poc.db ingest -k AP1 data/POC18888/AP1/job-*
+    python pan_db.py -d poc.db trend connectionRate
+    python pan_db.py -d poc.db query "SELECT j.job, s.metric, s.max FROM summary s JOIN jobs j USING (job_id) WHERE s.k = 0"
+
+"""
+
+import argparse
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from pan_ts import ts_read, ts_read_summary
+
+cf = {
+    'cnf_file': 'cf-*.json',
+    'sta_file': 'sta-[0-9]*.json',
+    'ts_file': 'ts-[0-9]*.npz',
+    'dp_csv_file': 'dp.csv',
+    'tra_csv_file': 'tra.csv',
+}
+
+# jobs are identified by the resolved path of the job folder, as job folder names (job-ddhhmm-host)
+# repeat across months and cases
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY, path TEXT UNIQUE, job TEXT, host TEXT, case_name TEXT, t_start INTEGER, t_end INTEGER
+);
+CREATE TABLE IF NOT EXISTS summary (
+    job_id INTEGER, metric TEXT, k INTEGER, min REAL, max REAL, ave REAL, cnt INTEGER,
+    PRIMARY KEY (job_id, metric, k)
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    job_id INTEGER, metric TEXT, k INTEGER, t INTEGER, value REAL
+);
+CREATE TABLE IF NOT EXISTS dp (
+    job_id INTEGER, dp_name TEXT, series TEXT, t INTEGER, value REAL
+);
+CREATE TABLE IF NOT EXISTS traffic (
+    job_id INTEGER, app TEXT, sessions INTEGER, bytes REAL, elapsed REAL
+);
+CREATE INDEX IF NOT EXISTS metrics_t ON metrics (metric, t);
+CREATE INDEX IF NOT EXISTS metrics_job ON metrics (job_id, metric);
+CREATE INDEX IF NOT EXISTS dp_t ON dp (dp_name, t);
+CREATE INDEX IF NOT EXISTS dp_job ON dp (job_id, dp_name);
+CREATE INDEX IF NOT EXISTS jobs_case ON jobs (case_name, t_start);
+CREATE INDEX IF NOT EXISTS jobs_host ON jobs (host, job);
+"""
+
+TABLES = ('summary', 'metrics', 'dp', 'traffic', 'jobs')
+
+
+def db_connect(db_file):
+    conn = sqlite3.connect(db_file)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def to_ns(timestamp):
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return round(timestamp.timestamp() * 1e6) * 1000
+
+
+def read_host(job_dir):
+    file = next(job_dir.glob(cf['cnf_file']), None)
+    if file is None:
+        return None
+    try:
+        with file.open("r", encoding="utf-8") as f:
+            return json.load(f)['cf']['hostname']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def read_samples(job_dir):
+    # {metric: (summary, [(t_ns, [values])])} from ts-*.npz or sta-*.json of earlier versions
+
+    output = {}
+
+    ts_file = next(job_dir.glob(cf['ts_file']), None)
+    if ts_file is not None:
+        summary = ts_read_summary(ts_file)
+        for metric, (t, v) in ts_read(ts_file).items():
+            output[metric] = (summary[metric], list(zip(t.tolist(), v.tolist())))
+        return output
+
+    sta_file = next(job_dir.glob(cf['sta_file']), None)
+    if sta_file is None:
+        return output
+
+    with sta_file.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    for metric, s in data.items():
+        samples = [(to_ns(ts), values) for ts, values in s.get('val', [])]
+        output[metric] = (s, samples)
+
+    return output
+
+
+def db_job_path(job_dir):
+    return str(Path(job_dir).resolve())
+
+
+def db_ingest_job(conn, job_dir, case=None, host=None):
+    job_dir = Path(job_dir)
+    job, path = job_dir.name, db_job_path(job_dir)
+
+    row = conn.execute("SELECT job_id, case_name FROM jobs WHERE path = ?", (path,)).fetchone()
+    if row is not None:  # re-ingest replaces the job, same id and case unless given
+        for table in TABLES:
+            conn.execute(f"DELETE FROM {table} WHERE job_id = ?", (row[0],))
+        case = case or row[1]
+
+    job_id = conn.execute(
+        "INSERT INTO jobs (job_id, path, job, host, case_name) VALUES (?, ?, ?, ?, ?)",
+        (row[0] if row is not None else None, path, job, host or read_host(job_dir), case or None)
+    ).lastrowid
+
+    t_start, t_end = None, None
+
+    for metric, (s, samples) in read_samples(job_dir).items():
+        for k, (v_min, v_max, v_ave) in enumerate(zip(s['min'], s['max'], s['ave'])):
+            conn.execute(
+                "INSERT INTO summary VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, metric, k, v_min, v_max, v_ave, s['cnt'])
+            )
+        conn.executemany(
+            "INSERT INTO metrics VALUES (?, ?, ?, ?, ?)",
+            ((job_id, metric, k, t, value) for t, values in samples for k, value in enumerate(values))
+        )
+        if samples:
+            t_start = min(t_start or samples[0][0], samples[0][0])
+            t_end = max(t_end or samples[-1][0], samples[-1][0])
+
+    file = job_dir / cf['dp_csv_file']
+    if file.is_file():
+        df = pd.read_csv(file)
+        t = pd.to_datetime(df['timestamp']).map(to_ns)
+        conn.executemany(
+            "INSERT INTO dp VALUES (?, ?, ?, ?, ?)",
+            zip([job_id] * len(df), df['dp'].astype(str), df['core'].astype(str), t, df['load'].astype(float))
+        )
+
+    file = job_dir / cf['tra_csv_file']
+    if file.is_file():
+        df = pd.read_csv(file)
+        stats = df.groupby("app").agg(
+            sessions=("app", "count"),
+            bytes=("bytes", "sum"),
+            elapsed=("elapsed", "sum"),
+        )
+        conn.executemany(
+            "INSERT INTO traffic VALUES (?, ?, ?, ?, ?)",
+            ((job_id, app, int(r.sessions), float(r.bytes), float(r.elapsed)) for app, r in stats.iterrows())
+        )
+
+    conn.execute("UPDATE jobs SET t_start = ?, t_end = ? WHERE job_id = ?", (t_start, t_end, job_id))
+    conn.commit()
+
+    return job
+
+
+def db_has_job(conn, job_dir):
+    return conn.execute("SELECT 1 FROM jobs WHERE path = ?", (db_job_path(job_dir),)).fetchone() is not None
+
+
+def db_set_case(conn, job_dir, case):
+    # case of a job ingested without one, e.g. during collection
+
+    conn.execute(
+        "UPDATE jobs SET case_name = ? WHERE path = ? AND case_name IS NOT ?", (case, db_job_path(job_dir), case)
+    )
+    conn.commit()
+
+
+def db_summary_max(conn, job_dir, metrics):
+    # {metric: max of the first value} for the results table in report.py
+
+    rows = conn.execute(
+        "SELECT s.metric, s.max FROM summary s JOIN jobs j USING (job_id) "
+        f"WHERE j.path = ? AND s.k = 0 AND s.metric IN ({','.join('?' * len(metrics))})",
+        (db_job_path(job_dir), *metrics)
+    ).fetchall()
+
+    return dict(rows)
+
+
+def db_trend(conn, metric, k=0):
+    return pd.read_sql_query(
+        "SELECT j.case_name AS 'case', j.host, j.job, s.min, s.ave, s.max, s.cnt "
+        "FROM summary s JOIN jobs j USING (job_id) "
+        "WHERE s.metric = ? AND s.k = ? ORDER BY j.t_start",
+        conn, params=(metric, k)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='pan_db.py', description='Cross-job database of pan-cli.py results.')
+    parser.add_argument('-d', '--db', type=str, default="pan.db", help="database file")
+    subparsers = parser.add_subparsers(dest='action', required=True)
+
+    p = subparsers.add_parser('ingest', help="ingest job folders")
+    p.add_argument('-k', '--case', type=str, default=None, help="test case of the jobs")
+    p.add_argument('jobs', nargs='+', help="job folders")
+
+    p = subparsers.add_parser('trend', help="summary of a metric across jobs")
+    p.add_argument('metric', type=str, help="metric")
+    p.add_argument('-i', '--index', type=int, default=0, help="value index of a multi-valued metric")
+
+    p = subparsers.add_parser('query', help="SQL query")
+    p.add_argument('sql', type=str, help="SQL")
+
+    args = parser.parse_args()
+
+    conn = db_connect(args.db)
+
+    if args.action == 'ingest':
+        for job_dir in args.jobs:
+            if Path(job_dir).is_dir():
+                print(f"job {db_ingest_job(conn, job_dir, case=args.case)} ingested")
+    elif args.action == 'trend':
+        print(db_trend(conn, args.metric, args.index).to_string(index=False))
+    elif args.action == 'query':
+        print(pd.read_sql_query(args.sql, conn).to_string(index=False))
+
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+
+pan-os-cli v2.6 [20261019]
+
+Compact time-series store for metric samples
+
+by Terence LEE <telee.hk@gmail.com>
+
+https://github.com/telee0/pan-os_cli
+
+"""
+
+import json
+
+import numpy as np
+
+# ts-*.npz layout
+#
+# _summary      JSON string of {metric: {min, max, ave, cnt, ..}}, readable without loading samples
+# <metric>.t    int64 epoch timestamps in ns, shape (T,)
+# <metric>.v    float32 values, shape (T, k) for k values per sample, float64 for values beyond 2 ** 24
+#               (integers exact in float32) such as byte and packet counters
+
+SUMMARY = '_summary'
+FLOAT32_MAX_EXACT = 2 ** 24
+
+
+def ts_write(file, stats):
+    arrays = {}
+    summary = {}
+
+    for metric, s in stats.items():
+        summary[metric] = {k: v for k, v in s.items() if k != 'val'}
+
+        samples = s.get('val', [])
+        timestamps = [ts for ts, _ in samples]
+        values = [v for _, v in samples]
+
+        t = np.array([round(ts.timestamp() * 1e6) for ts in timestamps], dtype=np.int64) * 1000  # us precision
+        v = np.array(values, dtype=np.float64).reshape(len(samples), -1)
+        if not np.any(np.abs(v) > FLOAT32_MAX_EXACT):  # NaN not beyond
+            v = v.astype(np.float32)
+
+        arrays[f"{metric}.t"] = t
+        arrays[f"{metric}.v"] = v
+
+    arrays[SUMMARY] = np.array(json.dumps(summary, default=str))
+
+    np.savez_compressed(file, **arrays)
+
+
+def ts_read_summary(file):
+    with np.load(file) as npz:  # members are loaded on access only
+        return json.loads(str(npz[SUMMARY]))
+
+
+def ts_read(file, metrics=None):
+    output = {}
+
+    with np.load(file) as npz:
+        summary = json.loads(str(npz[SUMMARY]))
+        for metric in summary.keys():
+            if metrics is not None and metric not in metrics:
+                continue
+            t = npz[f"{metric}.t"]
+            v = npz[f"{metric}.v"]
+            output[metric] = (t, v)
+
+    return output
+
+
+if __name__ == '__main__':
+    pass
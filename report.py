@@ -16,16 +16,20 @@ https://pexpect.readthedocs.io/en/stable/index.html
 
 """
 
+import hashlib
+import io
 import json
 import logging
 import os
 import re
-import statistics
+import shutil
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from copy import deepcopy
 from datetime import datetime
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import pymupdf
 from PIL import Image
@@ -33,15 +37,27 @@ from pptx import Presentation
 from pptx.dml.color import RGBColor
 from pptx.enum.shapes import PP_PLACEHOLDER
 from pptx.enum.text import PP_ALIGN
-from pptx.util import Cm, Inches, Pt
+from pptx.util import Cm, Emu, Inches, Pt
 
 from conf.cf_report import cf
+from pan_cli_log import cli_log_lines
+from pan_db import db_connect, db_has_job, db_ingest_job, db_set_case, db_summary_max
+from pan_ts import ts_read_summary
 
 
 ctx = {
     'start_time': datetime.now(),
 }
 
+PDF_CACHE_VERSION = 2  # bumped when pdf_read() output or the cache layout changes
+PDF_CACHE_CF = ('bp_sections', 'bp_section_re', 'bp_table_values_trim', 'bp_table_percentiles')  # settings affecting pdf_read()
+MANIFEST_VERSION = 1  # bumped when the case records read from pdfs and jobs change
+MANIFEST_CF = (  # settings affecting the case records, others (workers, caches, exports, ..) do not invalidate cases
+    'bp_reports', 'bp_sections', 'bp_section_re', 'bp_table_values_trim', 'bp_table_percentiles',
+    'job_dir', 'cli_file', 'sta_file', 'ts_file', 'pa_commands', 'pa_attrs', 'sta_metrics',
+    'other_files', 'other_files_exclude', 'dp_files_list', 'p_files_list', 'text',
+)
+
 
 def get_logger(name, log_file):
     logger = logging.getLogger(name)
@@ -80,6 +96,8 @@ def init():
         ctx['setup'][key] = set()
         ctx['setup'][f"{key}_ex"] = set()
     ctx['results'] = []
+    ctx['images'] = {}  # image blobs as embedded, by source content and display size
+    ctx['templates'] = {}  # (layout, shape elements) of source slides by index for slide_clone()
 
     start_time = ctx['start_time']
     ddhhmm = start_time.strftime('%d%H%M')
@@ -96,6 +114,9 @@ def init():
     ctx['log'].info(f"initializing the environment..")
 
     ctx['ctx_file'] = Path(ctx['report_dir']) / cf['ctx_file']
+    ctx['manifest_file'] = Path(cf['poc_dir']) / cf['manifest_file'] if cf.get('manifest_file') else None
+
+    ctx['db'] = db_connect(cf['db_file']) if cf.get('db_file') else None
 
     top_dir = Path(cf['poc_dir'])
 
@@ -124,6 +145,13 @@ def cleanup():
 
     ctx['prs'].save(Path(ctx['report_dir']) / cf['report_file'])
 
+    ctx['log'].info(f"{len(ctx['images'])} distinct image(s) embedded")
+    del ctx['images'], ctx['templates']
+
+    if ctx['db'] is not None:
+        ctx['db'].close()
+        ctx['db'] = None
+
     ctx['log'].info(f"report generation at {ctx['report_dir']} is completed, exiting..")
     ctx['end_time'] = datetime.now()
     ctx['log'].info(f"time elapsed: {ctx['end_time'] - ctx['start_time']}")
@@ -180,6 +208,71 @@ def results_to_dataframe(results):
     return df
 
 
+def bp_summary_rows(case, data_case):
+    rows = []
+
+    for pdf, data in data_case.items():
+        if not isinstance(data, dict) or 'pa' in data:  # flow_rate list and jobs skipped
+            continue
+        for section, values in data.items():
+            for k, value in enumerate(values.get('values', [])):
+                stats = value if isinstance(value, dict) else {'last': value}
+                for stat, v in stats.items():
+                    rows.append({'case': case, 'pdf': pdf, 'section': section, 'key': f"{k}.{stat}", 'value': v})
+            for key, v in values.get('params', {}).items():
+                rows.append({'case': case, 'pdf': pdf, 'section': section, 'key': key, 'value': v})
+            if 'bp_version' in values:
+                rows.append({'case': case, 'pdf': pdf, 'section': section, 'key': 'bp_version', 'value': values['bp_version']})
+
+    return rows
+
+
+def results_export(records):
+    # raw results and bp summaries for dashboards, plus the case records as input for later reports
+
+    report_dir = Path(ctx['report_dir'])
+
+    df = pd.DataFrame(ctx['results'])
+    cols = [c for c in cf['result_columns'].keys() if c in df.columns]
+    df = df.reindex(columns=cols).sort_values(by=["case", "job"]).reset_index(drop=True)
+    for col in cols[2:]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")  # "" for no value and numbers as text from pdfs
+
+    rows = [row for case, record in records.items() for row in bp_summary_rows(case, record['data'])]
+    df_bp = pd.DataFrame(rows, columns=['case', 'pdf', 'section', 'key', 'value'])
+    df_bp['text'] = df_bp['value'].astype(str)  # params and versions as text, one type per column
+    df_bp['value'] = pd.to_numeric(df_bp['value'], errors="coerce")
+
+    for name, df_ in (('results', df), ('bp', df_bp)):
+        for fmt in cf['export_formats']:
+            file = report_dir / f"{name}.{fmt}"
+            try:
+                if fmt == 'csv':
+                    df_.to_csv(file, index=False)
+                elif fmt == 'json':
+                    df_.to_json(file, orient="records", indent=2)
+                elif fmt == 'parquet':
+                    df_.to_parquet(file, index=False)
+            except ImportError as e:  # parquet needs pyarrow or fastparquet
+                ctx['log'].warning(f"file {file} not saved: {str(e)}")
+                continue
+            ctx['log'].info(f"file {file} saved")
+
+    file = report_dir / cf['export_file']
+    with file.open("w", encoding="utf-8") as f:
+        json.dump({'version': cf['version'], 'cases': records}, f, indent=2, default=str)
+    ctx['log'].info(f"file {file} saved")
+
+
+def results_import(file):
+    with open(file, "r", encoding="utf-8") as f:
+        records = json.load(f)['cases']
+
+    ctx['log'].info(f"{len(records)} case(s) imported from '{file}'")
+
+    return records
+
+
 def slide_cover():
     slide = ctx['prs'].slides[0]
     slide.placeholders[0].text = "\n".join([cf['cust_name'], cf['subject']])
@@ -212,6 +305,31 @@ def slide_add_bullets(text_frame, items):
     walk(items, 0)
 
 
+def image_prepare(image_path, width, height):
+    # downscaled to the display size at cf['image_dpi'] and cached by content, identical
+    # blobs are then embedded once as python-pptx shares image parts by hash
+
+    with open(image_path, "rb") as f:
+        blob = f.read()
+
+    dpi = cf.get('image_dpi', 0)
+    size = (max(1, round(Emu(width).inches * dpi)), max(1, round(Emu(height).inches * dpi)))
+    key = f"{hashlib.sha1(blob).hexdigest()}-{size[0]}x{size[1]}"
+
+    if key not in ctx['images']:
+        with Image.open(io.BytesIO(blob)) as img:
+            if dpi > 0 and img.width > size[0] and img.height > size[1]:
+                fmt = "JPEG" if img.format == "JPEG" else "PNG"
+                buf = io.BytesIO()
+                img.resize(size, Image.LANCZOS).save(buf, format=fmt, optimize=True, quality=85)
+                if buf.tell() < len(blob):
+                    blob = buf.getvalue()
+                ctx['log'].debug(f"image '{image_path}' {img.size} -> {size}, {len(blob):,} bytes")
+        ctx['images'][key] = blob
+
+    return io.BytesIO(ctx['images'][key])
+
+
 def slide_add_image(slide, placeholder, image_path, scale=1.1, caption=""):
     left = placeholder.left
     top = placeholder.top
@@ -253,7 +371,7 @@ def slide_add_image(slide, placeholder, image_path, scale=1.1, caption=""):
     )
 
     slide.shapes.add_picture(
-        image_path,
+        image_prepare(image_path, new_w, new_h),
         left,
         top,
         width=new_w,
@@ -368,7 +486,7 @@ def slide_add_with_tables(idx, df, header=True, title=""):
     i, j, n = 0, 1, n_rows_df
     while i < n:
         slide = slide_clone(idx, title=f"{title} ({j}/{n_slides})")
-        slide_ids.append(list(ctx['prs'].slides).index(slide))
+        slide_ids.append(ctx['prs'].slides._sldIdLst[-1])  # sldId of the slide just added at the end
         table = slide.shapes[shape_idx].table
 
         max_rows = min(n - i, n_rows_tab - 1)
@@ -400,9 +518,13 @@ def slide_add_with_tables(idx, df, header=True, title=""):
     return slide_ids
 
 
-def slide_add_with_images(idx, path, images_list, title="", exclude=None):
+def images_find(path, images_list, title="", exclude=None):
+    # slide specs ('add', title, image, caption) for images matching the patterns in images_list
+
+    specs = []
+
     if images_list is None:
-        return
+        return specs
     if exclude is None:
         exclude = []
     for images in images_list:
@@ -412,7 +534,24 @@ def slide_add_with_images(idx, path, images_list, title="", exclude=None):
             if image_path.name in exclude:
                 ctx['log'].info(f"image_path {image_path} excluded")
                 continue
-            slide_add(idx, title=f"{title.format(image_path.stem)}", image=str(image_path))
+            specs.append(('add', f"{title.format(image_path.stem)}", str(image_path), ""))
+
+    return specs
+
+
+def slide_add_with_images(idx, path, images_list, title="", exclude=None):
+    for _, title_, image, caption in images_find(path, images_list, title=title, exclude=exclude):
+        slide_add(idx, title=title_, image=image, caption=caption)
+
+
+def slides_build(specs):
+    for kind, *args in specs:
+        if kind == 'clone':
+            key, title = args
+            slide_clone(cf['sldId'][key], title=title)
+        else:
+            title, image, caption = args
+            slide_add(cf['sldId']['new'], title=title, image=image, caption=caption)
 
 
 def slide_add(idx=1, title="", text=None, image=None, caption="", table=None):
@@ -436,17 +575,41 @@ def slide_add(idx=1, title="", text=None, image=None, caption="", table=None):
     return slide
 
 
+def slides_reorder(moves, position):
+    # final order built once: slides in moves at position, the last slide at the end, removal applied
+
+    sldIdLst = ctx['prs'].slides._sldIdLst
+    last = ctx['last_sldId']
+
+    moved = {sldId.get('id') for sldId in moves} | {last.get('id')}
+    order = [sldId for sldId in sldIdLst if sldId.get('id') not in moved]
+    order[position:position] = moves  # move the result slides to the target position
+    order.append(last)  # move the previous last slide to the end of the deck
+
+    if 'removal' in cf['sldId']:
+        left, right = cf['sldId']['removal']
+        del order[left:right]
+
+    for sldId in list(sldIdLst):
+        sldIdLst.remove(sldId)
+    for sldId in order:
+        sldIdLst.append(sldId)
+
+
 def slide_clone(idx=1, title=""):
-    source = ctx['prs'].slides[idx]
-    slide = ctx['prs'].slides.add_slide(source.slide_layout)
+    if idx not in ctx['templates']:  # source slide shapes copied once
+        source = ctx['prs'].slides[idx]
+        ctx['templates'][idx] = (source.slide_layout, [deepcopy(shape.element) for shape in source.shapes])
+    layout, elements = ctx['templates'][idx]
+
+    slide = ctx['prs'].slides.add_slide(layout)
 
     for shape in list(slide.shapes):
         shape.element.getparent().remove(shape.element)
 
-    for shape in source.shapes:
-        element = deepcopy(shape.element)
+    for element in elements:
         slide.shapes._spTree.insert_element_before(
-            element, 'p:extLst'
+            deepcopy(element), 'p:extLst'
         )
 
     for shape in slide.placeholders:
@@ -507,10 +670,10 @@ def pdf_page_get_images(doc, page, file_prefix="pdf-{}.png"):
     return image_paths
 
 
-def pdf_page_find_line(page, text="", regex=None):
-    blocks = page.get_text("dict")["blocks"]
+def pdf_page_lines(page):
+    lines = []
 
-    for block in blocks:
+    for block in page.get_text("dict")["blocks"]:
         if block["type"] != 0:
             continue
         for line in block["lines"]:
@@ -522,49 +685,79 @@ def pdf_page_find_line(page, text="", regex=None):
                     + f"{line['spans'][0]['size']:4.1f}  "
                     + f"'{line_text}'"
                 )
-            if text and text in line_text:
-                return line
-            if regex is not None and regex.match(line_text):
-                return line
+            lines.append((line_text, line))
+
+    return lines
+
+
+def pdf_page_cached(doc, page_num, cache, key):
+    # text lines and tables extracted at most once per page, shared by sections on the same page
+
+    entry = cache.setdefault(page_num % len(doc), {})
+    if key not in entry:
+        page = doc[page_num]
+        entry[key] = pdf_page_lines(page) if key == 'lines' else page.find_tables()
+
+    return entry[key]
+
+
+def pdf_page_find_line(page, text="", regex=None, lines=None):
+    if lines is None:
+        lines = pdf_page_lines(page)
+
+    for line_text, line in lines:
+        if text and text in line_text:
+            return line
+        if regex is not None and regex.match(line_text):
+            return line
 
     return None
 
 
-def pdf_find_section(doc, section):
-    toc = doc.get_toc()
+def pdf_find_section(toc, section):
+    # (page, end) with end as the page of the next toc entry, None if there is none
 
-    for level, text, page in toc:
+    for k, (level, text, page) in enumerate(toc):
         if section.lower() in text.lower():
-            return page - 1      # PyMuPDF pages are 0-based
+            end = toc[k + 1][2] - 1 if k + 1 < len(toc) else None
+            return page - 1, end  # PyMuPDF pages are 0-based
+
+    return -1, None  # not found which may cause errors
+
 
-    return -1  # not found which may cause errors
+def pdf_image_prefix(pdf):
+    # images of all cases are extracted into report_dir, named by case and pdf as reports of cases may share names
+
+    return f"{pdf.parent.name}-{pdf.stem}"
 
 
 def pdf_read(pdf):
     ctx['log'].info(f"reading pdf '{pdf.name }'")
 
     doc = pymupdf.open(pdf)
+    toc = doc.get_toc()  # section boundaries from the toc, read once
 
     section_re = re.compile(cf['bp_section_re'])
 
     data = {}
+    cache = {}
 
     for i, (sect_key, section) in enumerate(cf['bp_sections'].items()):
-        page_num = pdf_find_section(doc, section)
+        page_num, end_num = pdf_find_section(toc, section)
         page = doc[page_num]
 
         data[section] = {}
 
         ctx['log'].info(f"===== Section '{section}' @ Page {page_num + 1} =====")
-        line = pdf_page_find_line(page, text=section)
+        line = pdf_page_find_line(page, text=section, lines=pdf_page_cached(doc, page_num, cache, 'lines'))
         if line is not None:
             ctx['log'].info(f"line: text '{line['spans'][0]['text']}'")
 
-        file_prefix = f"{pdf.stem}-{i:02d}-{page_num}-{{}}"
+        file_prefix = f"{pdf_image_prefix(pdf)}-{i:02d}-{page_num}-{{}}"
         image_paths = pdf_page_get_images(doc, page, file_prefix)
         data[section]['image_paths']= image_paths
 
-        tables = page.find_tables()
+        tables = pdf_page_cached(doc, page_num, cache, 'tables')
         ctx['log'].info(f"section '{section}' contains {len(tables.tables)} table(s)")
 
         table_mode = "none"
@@ -575,21 +768,20 @@ def pdf_read(pdf):
 
         if table_mode == "multiple":
             rows = []
-            end_of_section = False
-            while page_num < len(doc):
-                for table in tables.tables:
+            for table in tables.tables:
+                rows.extend(table.extract())
+            page_num %= len(doc)
+            if end_num is None:  # last toc entry, end of section by the next section heading
+                end_num = page_num + 1
+                while end_num < len(doc):
+                    lines = pdf_page_cached(doc, end_num, cache, 'lines')
+                    if pdf_page_find_line(doc[end_num], regex=section_re, lines=lines) is not None:
+                        break
+                    end_num += 1
+            ctx['log'].info(f"section '{section}' @ Pages {page_num + 1}-{max(page_num + 1, end_num)}")
+            for page_num in range(page_num + 1, end_num):  # pages within the section only
+                for table in pdf_page_cached(doc, page_num, cache, 'tables').tables:
                     rows.extend(table.extract())
-                page_num += 1
-                page = doc[page_num]
-
-                line = pdf_page_find_line(page, regex=section_re)
-                if line is not None:
-                    end_of_section = True
-                    ctx['log'].info(f"end_of_section: text '{line['spans'][0]['text']}'")
-                if end_of_section:
-                    break
-
-                tables = page.find_tables()
             if sect_key == "super_flow_data_throughput":
                 data[section]['values'] = table_summary(rows)
             elif sect_key == "tcp_average_time_response_packet":
@@ -616,49 +808,127 @@ def pdf_read(pdf):
     return data
 
 
+def pdf_worker_init(report_dir, log_file, verbose, debug):
+    ctx.update({'report_dir': report_dir, 'log_file': log_file, 'verbose': verbose, 'debug': debug})
+    ctx['log'] = get_logger(__name__, os.path.join(report_dir, log_file))
+    ctx['log'].setLevel(logging.DEBUG if debug else logging.INFO if verbose else logging.WARNING)
+
+
+def pdf_cache_key(pdf):
+    h = hashlib.sha256()
+
+    with open(pdf, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+
+    settings = {key: cf[key] for key in PDF_CACHE_CF}
+    h.update(json.dumps([PDF_CACHE_VERSION, settings], sort_keys=True).encode())
+
+    return h.hexdigest()
+
+
+def pdf_cache_tmp(file):
+    # cache files are written under a temporary name and renamed into place,
+    # so workers on identical pdfs never read partial files
+
+    return file.with_name(f"{file.name}.{os.getpid()}.tmp")
+
+
+def pdf_read_cached(pdf):
+    if not cf.get('pdf_cache_dir'):
+        return pdf_read(pdf)
+
+    cache_dir = Path(cf['pdf_cache_dir']) / pdf_cache_key(pdf)
+    cache_file = cache_dir / "data.json"
+    prefix = pdf_image_prefix(pdf)
+
+    # images cached without the prefix, as identical pdfs of different cases share the entry
+
+    if cache_file.is_file():
+        ctx['log'].info(f"pdf '{pdf.name}' found in cache '{cache_dir}'")
+        with cache_file.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        for section in data.values():
+            section['image_paths'] = [
+                shutil.copy2(cache_dir / name, os.path.join(ctx['report_dir'], f"{prefix}-{name}"))
+                for name in section['image_paths']
+            ]
+        return data
+
+    data = pdf_read(pdf)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cached = deepcopy(data)
+    for section in cached.values():
+        names = [Path(image_path).name[len(prefix) + 1:] for image_path in section['image_paths']]
+        for image_path, name in zip(section['image_paths'], names):
+            tmp_file = pdf_cache_tmp(cache_dir / name)
+            shutil.copy2(image_path, tmp_file)
+            os.replace(tmp_file, cache_dir / name)
+        section['image_paths'] = names
+
+    tmp_file = pdf_cache_tmp(cache_file)
+    with tmp_file.open("w", encoding="utf-8") as f:
+        json.dump(cached, f, indent=2)
+    os.replace(tmp_file, cache_file)  # written last, entries without it are never read
+
+    return data
+
+
+def pdf_read_all(pdf_list):
+    workers = cf.get('pdf_workers', 0)  # 0 for one worker per cpu
+
+    if workers == 1 or len(pdf_list) <= 1:
+        return {pdf: pdf_read_cached(pdf) for pdf in pdf_list}
+
+    ctx['log'].info(f"reading {len(pdf_list)} pdf(s) with {workers or os.cpu_count()} workers..")
+
+    with ProcessPoolExecutor(  # PyMuPDF is not thread safe
+        max_workers=workers or None,
+        initializer=pdf_worker_init,
+        initargs=(ctx['report_dir'], ctx['log_file'], ctx['verbose'], ctx['debug']),
+    ) as executor:
+        return dict(zip(pdf_list, executor.map(pdf_read_cached, pdf_list)))
+
+
 def table_summary(table, indexes=None, last_only=False):
     ctx['log'].info(f"{len(table)} rows")
     ctx['log'].debug("rows:\n" + "\n".join([f"\t{row}" for row in table]))
 
     if indexes is None:
         indexes = [-1]
-    n_indexes = len(indexes)
 
-    values_list = [[] for _ in indexes]
+    # cells of the columns converted at once, blanks and non-numeric cells to NaN, e.g. "~1,234.5" to 1234.5
 
-    for row in table:
-        values = []
-        for i in range(n_indexes):
-            value = row[indexes[i]]
-            try:
-                values.append(float(value.replace(",", "").replace("~", "")))
-            except (AttributeError, ValueError):
-                pass
-        if len(values) < len(indexes):
-            continue
-        for i, value in enumerate(values):
-            values_list[i].append(value)
+    cells = pd.Series([str(row[i]) for row in table for i in indexes], dtype=object)
+    cells = cells.str.replace(r'[,~\s]', '', regex=True)
+    values_array = pd.to_numeric(cells, errors='coerce').to_numpy(dtype=float).reshape(len(table), len(indexes))
+    values_array = values_array[~np.isnan(values_array).any(axis=1)]  # rows with all the columns numeric
 
     summary_list = []
 
     if last_only:
-        for values in values_list:
-            summary_list.append(values[-1])
+        summary_list = values_array[-1].tolist()
         ctx['log'].info(f"summary_list: {summary_list}")
         return summary_list
 
-    for values in values_list:
-        n = len(values)
-        trim_left, trim_right = cf['bp_table_values_trim']
-        left, right = int(n * trim_left), int(n * trim_right)
-        values = values[left:-right] if right else values  # remove first x% and last y%
+    n = len(values_array)
+    trim_left, trim_right = cf['bp_table_values_trim']
+    left, right = int(n * trim_left), int(n * trim_right)
+    values_array = values_array[left:n - right] if right else values_array  # remove first x% and last y%
+
+    percentiles = cf.get('bp_table_percentiles', [])
+    q = np.percentile(values_array, [50, *percentiles], axis=0)
+
+    for i, values in enumerate(values_array.T):
         summary = {
             'cnt': len(values),
-            'min': min(values),
-            'avg': statistics.mean(values),
-            'med': statistics.median(values),
-            'max': max(values),
+            'min': float(values.min()),
+            'avg': float(values.mean()),
+            'med': float(q[0, i]),
+            'max': float(values.max()),
         }
+        summary.update({f"p{p}": float(q[k + 1, i]) for k, p in enumerate(percentiles)})
         summary_list.append(summary)
 
     ctx['log'].info(f"summary_list: {summary_list}")
@@ -674,26 +944,49 @@ def pa_read(job):
         ctx['log'].warn("CLI log not found.")
         return {}  # pa_info
 
-    with log_file.open("r", encoding="utf-8", errors="ignore") as f:
-        lines = f.readlines()
+    attrs = cf['pa_attrs']
+    attrs_re = re.compile("|".join(re.escape(attr) for attr in sorted(attrs, key=len, reverse=True)))
 
-    for attr in cf['pa_attrs']:
-        for line in lines:
-            if attr in line:
-                value = line.partition(":")[2].strip()
-                pa_info[attr] = value
-                break
+    # one pass over the lines of the command blocks, all attributes matched at once
+
+    for entry, line in cli_log_lines(log_file, commands=cf['pa_commands']):
+        for m in attrs_re.finditer(line):
+            if m.group(0) not in pa_info:
+                pa_info[m.group(0)] = line.partition(":")[2].strip()
+        if len(pa_info) == len(attrs):
+            break  # the rest of the log not read
+
+    pa_info = {attr: pa_info[attr] for attr in attrs if attr in pa_info}  # in the order of pa_attrs
 
     ctx['log'].info("pa_info:\n" + "\n".join(f"\t{k}: {v}" for k, v in pa_info.items()))
 
     return pa_info
 
 
-def sta_read(job):
-    json_file = next(job.glob(cf['sta_file']))
+def sta_read_db(job, case):
+    if not db_has_job(ctx['db'], job):
+        db_ingest_job(ctx['db'], job, case=case)
+        ctx['log'].info(f"job '{job.name}' ingested")
+    elif case:
+        db_set_case(ctx['db'], job, case)  # jobs ingested during collection
+
+    data = db_summary_max(ctx['db'], job, list(cf['sta_metrics'].keys()))
+
+    return {key: int(data[key]) if data.get(key) is not None else None for key in cf['sta_metrics'].keys()}
+
 
-    with json_file.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+def sta_read(job, case=None):
+    if ctx['db'] is not None:
+        return sta_read_db(job, case)
+
+    ts_file = next(job.glob(cf['ts_file']), None) if 'ts_file' in cf else None
+
+    if ts_file is not None:
+        data = ts_read_summary(ts_file)  # summary header only, samples not loaded
+    else:
+        json_file = next(job.glob(cf['sta_file']))
+        with json_file.open("r", encoding="utf-8") as f:
+            data = json.load(f)
 
     result = {}
     for key in cf['sta_metrics'].keys():
@@ -705,6 +998,177 @@ def sta_read(job):
     return result
 
 
+def case_fingerprint(folder):
+    # input files of a case by path, size and mtime, plus the settings affecting it and the reader version
+
+    settings = {key: cf.get(key) for key in MANIFEST_CF}
+    h = hashlib.sha1(json.dumps([MANIFEST_VERSION, settings], sort_keys=True, default=str).encode())
+
+    for path in sorted(folder.rglob("*")):
+        if path.is_file() and not path.name.endswith(".idx.json"):  # indexes written by the readers
+            stat = path.stat()
+            h.update(f"{path.relative_to(folder)}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+
+    return h.hexdigest()
+
+
+def case_reusable(record, fingerprint):
+    if record is None or record.get('fingerprint') != fingerprint:
+        return False
+
+    return all(Path(spec[2]).is_file() for spec in record['slides'] if spec[0] == 'add')  # e.g. pdf images
+
+
+def job_read(job, case):
+    pa_info = pa_read(job)
+    stats = sta_read(job, case) if ctx['db'] is None else None  # database connection kept in the main thread
+    return pa_info, stats
+
+
+def jobs_read(jobs, cases):
+    # pa_info and stats summaries of all jobs, read in threads as the reads are I/O bound
+
+    workers = cf.get('job_workers', 0)  # 0 for the executor default
+
+    ctx['log'].info(f"reading {len(jobs)} job(s)..")
+
+    with ThreadPoolExecutor(max_workers=workers or None) as executor:
+        job_data = dict(zip(jobs, executor.map(job_read, jobs, cases)))
+
+    if ctx['db'] is not None:
+        for job, case in zip(jobs, cases):
+            job_data[job] = (job_data[job][0], sta_read(job, case))
+
+    return job_data
+
+
+def case_read(folder, pdf_list, pdf_data, job_list, job_data):
+    # data, setup details, results and slide specs of a case, all serializable for the manifest
+
+    case = folder.name
+
+    record = {'data': {}, 'setup': {}, 'results': [], 'slides': []}
+    data_case, setup, slides = record['data'], record['setup'], record['slides']
+
+    slides.append(('clone', 'section', case))  # slide for section start
+    slides.append(('clone', 'case', f"{cf['text']['case']} - {case}"))  # slide for test case details
+
+    throughput, flow_rate = "", ""
+    for pdf in pdf_list:
+        ctx['log'].info(f"case '{case}' pdf '{pdf.name}'")
+        data = pdf_data[pdf]
+        data_case[pdf.stem] = data
+        setup.setdefault('bp_version', []).append(data[cf['bp_sections']['test_device']]['bp_version'])
+        throughput = data[cf['bp_sections']['super_flow_data_throughput']]['values'][-1]['avg']
+        if 'flow_rate' not in data_case:
+            data_case['flow_rate'] = []
+        flow_rate = data[cf['bp_sections']['test_parameters']]['params']['Maximum Flow Creation Rate']
+        data_case['flow_rate'].append(flow_rate)
+    for pdf in data_case:
+        data = data_case[pdf]
+        for section in cf['bp_sections'].values():
+            if section not in data:
+                continue
+            caption = str(data[section]['values']) if 'values' in data[section] else ""
+            for image in data[section]['image_paths']:
+                slides.append(('add', f"{case} - {section}", image, caption))
+
+    for job in job_list:
+        data_case[job.stem] = {}
+        ctx['log'].info(f"case '{case}' job '{job.name}'")
+        pa_info, stats = job_data[job]
+        data_case[job.stem]['pa'] = pa_info
+
+        for key in cf['pa_attrs']:
+            setup.setdefault(key, []).append(pa_info[key])
+        setup.setdefault('sw-version_ex', []).append(f"{pa_info['sw-version']} ({pa_info['model']})")
+        setup.setdefault('app-version_ex', []).append(f"{pa_info['app-version']} ({pa_info['app-release-date'][:10]})")
+
+        stats.update({
+            'case': case,
+            'job': job.name,
+            'throughput': throughput,
+            'flow_rate': flow_rate,
+            'supportedSessions': int(pa_info['sessions supported'])
+        })
+        throughput, flow_rate = "", ""  # used once
+        record['results'].append(stats)
+        slides.extend(images_find(job, cf['dp_files_list'], title=f"{case} - {cf['text']['dp']} ({{}})"))
+        slides.extend(images_find(job, cf['p_files_list'], title=f"{case} - {cf['text']['util']} ({{}})"))
+
+    slides.extend(images_find(folder, [cf['other_files']], exclude=cf['other_files_exclude'], title=f"{case} - {{}}"))
+
+    return record
+
+
+def case_apply(case, record):
+    ctx['cases'][case] = record['data']
+    for key, values in record['setup'].items():
+        ctx['setup'][key].update(values)
+    ctx['results'].extend(record['results'])
+    slides_build(record['slides'])
+
+
+def manifest_read():
+    file = ctx['manifest_file']
+
+    if file is None or not file.is_file():
+        return {}
+
+    try:
+        with file.open("r", encoding="utf-8") as f:
+            return json.load(f)['cases']
+    except (OSError, ValueError, KeyError) as e:
+        ctx['log'].warning(f"manifest '{file}' ignored: {str(e)}")
+        return {}
+
+
+def manifest_write(records):
+    file = ctx['manifest_file']
+
+    if file is None:
+        return
+
+    with file.open("w", encoding="utf-8") as f:
+        json.dump({'version': cf['version'], 'cases': records}, f, indent=2, default=str)
+
+    ctx['log'].info(f"manifest '{file}' saved")
+
+
+def cases_read():
+    manifest = manifest_read()
+    records, fingerprints = {}, {}
+    for folder in ctx['folders_case']:
+        case = folder.name
+        fingerprints[case] = case_fingerprint(folder)
+        if case_reusable(manifest.get(case), fingerprints[case]):
+            ctx['log'].info(f"case '{case}' unchanged since the last report")
+            records[case] = manifest[case]
+
+    folders_changed = [folder for folder in ctx['folders_case'] if folder.name not in records]
+    pdf_lists = {folder: list(folder.glob(cf['bp_reports'])) for folder in folders_changed}
+    pdf_data = pdf_read_all([pdf for pdf_list in pdf_lists.values() for pdf in pdf_list])  # all cases at once
+    job_lists = {folder: list(folder.glob(cf['job_dir'])) for folder in folders_changed}
+    job_data = jobs_read(
+        [job for job_list in job_lists.values() for job in job_list],
+        [folder.name for folder, job_list in job_lists.items() for _ in job_list],
+    )
+
+    for folder in ctx['folders_case']:
+        case = folder.name
+        print(". " * 40)
+        ctx['log'].info(f"case '{case}'")
+
+        if case not in records:
+            records[case] = case_read(folder, pdf_lists[folder], pdf_data, job_lists[folder], job_data)
+            records[case]['fingerprint'] = fingerprints[case]
+        case_apply(case, records[case])
+
+    manifest_write(records)
+
+    return records
+
+
 def main():
     init()
 
@@ -714,62 +1178,14 @@ def main():
     # slide = slide_add(1, title=cf['agenda'])
     # slide_add_bullets(slide.placeholders[1].text_frame, cf['agenda_items'])
 
-    for folder in ctx['folders_case']:
-        case = folder.name
-        print(". " * 40)
-        ctx['log'].info(f"case '{case}'")
-
-        slide_clone(cf['sldId']['section'], title=case)  # slide for section start
-        slide_clone(cf['sldId']['case'], title=f"{cf['text']['case']} - {case}")  # slide for test case details
-
-        ctx['cases'][case] = {}
-        throughput, flow_rate = "", ""
-        pdf_list = list(folder.glob(cf['bp_reports']))
-        for pdf in pdf_list:
-            ctx['log'].info(f"case '{case}' pdf '{pdf.name}'")
-            data = pdf_read(pdf)
-            ctx['cases'][case][pdf.stem] = data
-            ctx['setup']['bp_version'].add(data[cf['bp_sections']['test_device']]['bp_version'])
-            throughput = data[cf['bp_sections']['super_flow_data_throughput']]['values'][-1]['avg']
-            if 'flow_rate' not in ctx['cases'][case]:
-                ctx['cases'][case]['flow_rate'] = []
-            flow_rate = data[cf['bp_sections']['test_parameters']]['params']['Maximum Flow Creation Rate']
-            ctx['cases'][case]['flow_rate'].append(flow_rate)
-        for pdf in ctx['cases'][case]:
-            data = ctx['cases'][case][pdf]
-            for section in cf['bp_sections'].values():
-                if section not in data:
-                    continue
-                caption = str(data[section]['values']) if 'values' in data[section] else ""
-                for image in data[section]['image_paths']:
-                    slide_add(cf['sldId']['new'], title=f"{case} - {section}", image=image, caption=caption)
-
-        job_list = list(folder.glob(cf['job_dir']))
-        for job in job_list:
-            ctx['cases'][case][job.stem] = {}
-            ctx['log'].info(f"case '{case}' job '{job.name}'")
-            pa_info = pa_read(job)
-            ctx['cases'][case][job.stem]['pa'] = pa_info
-
-            for key in cf['pa_attrs']:
-                ctx['setup'][key].add(pa_info[key])
-            ctx['setup']['sw-version_ex'].add(f"{pa_info['sw-version']} ({pa_info['model']})")
-            ctx['setup']['app-version_ex'].add(f"{pa_info['app-version']} ({pa_info['app-release-date'][:10]})")
-
-            stats = sta_read(job)
-            stats.update({
-                'case': case,
-                'job': job.name,
-                'throughput': throughput,
-                'flow_rate': flow_rate,
-                'supportedSessions': int(pa_info['sessions supported'])
-            })
-            throughput, flow_rate = "", ""  # used once
-            ctx['results'].append(stats)
-            slide_add_with_images(cf['sldId']['new'], job, cf['dp_files_list'], title=f"{case} - {cf['text']['dp']} ({{}})")
-            slide_add_with_images(cf['sldId']['new'], job, cf['p_files_list'], title=f"{case} - {cf['text']['util']} ({{}})")
-
-        slide_add_with_images(cf['sldId']['new'], folder, [cf['other_files']], exclude=cf['other_files_exclude'], title=f"{case} - {{}}")
+    if cf.get('export_input'):  # cases from an earlier report, no pdfs or jobs read
+        records = results_import(cf['export_input'])
+        for case, record in records.items():
+            print(". " * 40)
+            ctx['log'].info(f"case '{case}'")
+            case_apply(case, record)
+    else:
+        records = cases_read()
 
     slide_clone(cf['sldId']['section'], title=cf['text']['others'])  # slide for section start
     for folder in ctx['folders_other']:
@@ -779,23 +1195,12 @@ def main():
     slide_format(slide, ctx['setup'])
 
     df = results_to_dataframe(ctx['results'])
-    idx_list = slide_add_with_tables(cf['sldId']['results'], df, header=True, title=cf['text']['results'])
-    print(f"idx_list: {idx_list}")
-    slides = ctx['prs'].slides._sldIdLst
-    for i, idx in enumerate(idx_list):
-        sldId = slides[idx]
-        slides.remove(sldId)
-        slides.insert(cf['sldId']['results'] + i, sldId)  # move the result slides to the target position
-
-    slides = ctx['prs'].slides._sldIdLst
-    slides.remove(ctx['last_sldId'])
-    slides.append(ctx['last_sldId'])  # move the previous last slide to the end of the deck
+    sldId_list = slide_add_with_tables(cf['sldId']['results'], df, header=True, title=cf['text']['results'])
+    ctx['log'].info(f"result slides: {[sldId.get('id') for sldId in sldId_list]}")
 
-    if 'removal' in cf['sldId']:
-        left, right = cf['sldId']['removal']
-        slides_removal = list(slides[left:right])
-        for sldId in slides_removal:
-            slides.remove(sldId)
+    slides_reorder(sldId_list or [], cf['sldId']['results'])
+
+    results_export(records)
 
     cleanup()
 
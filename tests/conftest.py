@@ -0,0 +1,31 @@
+import importlib.util
+import logging
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(scope="session")
+def pan_cli():
+    # pan-cli.py loaded as a module, the name is not importable as is
+    pytest.importorskip("paramiko_expect")
+    pytest.importorskip("requests")  # pan_api
+    spec = importlib.util.spec_from_file_location("pan_cli", ROOT / "pan-cli.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.ctx['log'] = logging.getLogger("pan_cli")
+    return module
+
+
+@pytest.fixture(scope="session")
+def report():
+    pytest.importorskip("pymupdf")
+    pytest.importorskip("pptx")
+    import report
+    report.ctx['log'] = logging.getLogger("report")
+    return report
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import pytest
+
+from pan_cli_log import cli_log_build_index, cli_log_index, cli_log_index_file, cli_log_lines, cli_log_write
+
+BLOCKS = [
+    (0, 0, datetime(2026, 10, 19, 10, 0, 0), "show session info"),
+    (0, 0, datetime(2026, 10, 19, 10, 0, 1), "show running resource-monitor second last 5"),
+    (1, 2, datetime(2026, 10, 19, 10, 0, 2), "show system info"),
+]
+DATA = [
+    "show session info\nnumber of sessions supported: 100\n\nfw>",
+    "show running resource-monitor second last 5\nDP dp0:\n",
+    "show system info\nsw-version: 11.1.0\nfw>",
+]
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    return tmp_path / "cli-1.log"
+
+
+def test_index_with_markers(log_file):
+    index = cli_log_write(log_file, BLOCKS, DATA, markers=True)
+    assert cli_log_build_index(log_file) == index
+    assert cli_log_index(log_file) == index
+    text = log_file.read_bytes()
+    assert [text[e['offset']:e['offset'] + e['length']].decode() for e in index] == [d + "\n" for d in DATA]
+
+
+def test_appended_blocks(log_file):
+    cli_log_write(log_file, BLOCKS[:2], DATA[:2], markers=True)
+    index = cli_log_write(log_file, BLOCKS[2:], DATA[2:], markers=True)
+    assert len(index) == 3
+    assert cli_log_build_index(log_file) == index
+
+
+def test_without_markers(log_file):
+    index = cli_log_write(log_file, BLOCKS, DATA)
+    assert log_file.read_text() == "\n".join(DATA)  # as written by earlier versions
+    text = log_file.read_bytes()
+    assert [text[e['offset']:e['offset'] + e['length']].decode() for e in index] == DATA
+    assert cli_log_index(log_file) == index  # from the sidecar, no rescan
+
+
+def test_lines(log_file):
+    index = cli_log_write(log_file, BLOCKS, DATA)
+    lines = [line for _, line in cli_log_lines(log_file, commands=[r'system info'], index=index)]
+    assert lines == ["show system info", "sw-version: 11.1.0", "fw>"]
+    lines = [line for _, line in cli_log_lines(log_file, commands=[r'session info'], index=index)]
+    assert lines[1] == "number of sessions supported: 100"
+
+
+def test_stale_index_rebuilt(log_file):
+    cli_log_write(log_file, BLOCKS, DATA, markers=True)
+    with open(cli_log_index_file(log_file), "w") as f:
+        f.write("{}")
+    assert cli_log_index(log_file) == cli_log_build_index(log_file)
@@ -0,0 +1,36 @@
+import numpy as np
+
+
+def test_delta_and_rate(pan_cli):
+    val_np = np.array([[10.0], [15.0], [25.0]])
+    t = np.array([0.0, 5.0, 10.0])
+    delta, rate = pan_cli.counter_delta(val_np, t)
+    assert np.isnan(delta[0, 0]) and np.isnan(rate[0, 0])
+    assert delta[1:, 0].tolist() == [5.0, 10.0]
+    assert rate[1:, 0].tolist() == [1.0, 2.0]
+
+
+def test_gap_given_to_sample_after(pan_cli):
+    val_np = np.array([[10.0], [np.nan], [30.0]])
+    t = np.array([0.0, 5.0, 10.0])
+    delta, rate = pan_cli.counter_delta(val_np, t)
+    assert np.isnan(delta[1, 0])
+    assert delta[2, 0] == 20.0 and rate[2, 0] == 2.0
+
+
+def test_wrap(pan_cli):
+    wrap = 2 ** 32
+    val_np = np.array([[wrap - 10.0], [5.0]])
+    delta, _ = pan_cli.counter_delta(val_np, np.array([0.0, 1.0]), wrap=wrap)
+    assert delta[1, 0] == 15.0
+
+
+def test_reset(pan_cli):
+    val_np = np.array([[1000.0], [7.0]])
+    delta, _ = pan_cli.counter_delta(val_np, np.array([0.0, 1.0]))
+    assert delta[1, 0] == 7.0  # counted from 0
+
+
+def test_too_few_samples(pan_cli):
+    delta, rate = pan_cli.counter_delta(np.array([[1.0, 2.0]]), np.array([0.0]))
+    assert delta.shape == (1, 2) and np.isnan(delta).all() and np.isnan(rate).all()
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def compile_metrics2(pan_cli, monkeypatch):
+    def compile_metrics2(metrics, metrics2):
+        monkeypatch.setattr(pan_cli, 'metrics', metrics, raising=False)
+        monkeypatch.setattr(pan_cli, 'metrics2', metrics2, raising=False)
+        return pan_cli.metrics2_compile()
+    return compile_metrics2
+
+
+METRICS = {
+    'cps': r'cps: (\d+)',
+    'bytes': {'regex': r'bytes: (\d+)', 'type': 'counter'},
+}
+
+
+def test_dependency_order(compile_metrics2):
+    compiled, errors = compile_metrics2(METRICS, {'b': 'a * 2', 'a': 'cps + bytes_rate'})
+    assert errors == []
+    assert list(compiled) == ['a', 'b']
+    assert compiled['a'][2] == ['bytes_rate', 'cps']
+
+
+def test_cycle(compile_metrics2):
+    _, errors = compile_metrics2(METRICS, {'a': 'b + 1', 'b': 'a + cps'})
+    assert len(errors) == 1 and errors[0].startswith("circular reference:")
+
+
+def test_unknown_name(compile_metrics2):
+    _, errors = compile_metrics2(METRICS, {'a': 'cps + sessions'})
+    assert errors == ["a: unknown ['sessions']"]
+
+
+def test_not_allowed(compile_metrics2):
+    _, errors = compile_metrics2(METRICS, {'a': '__import__("os")', 'b': 'np.load(cps)'})
+    assert len(errors) == 2
+
+
+def test_eval(pan_cli, compile_metrics2):
+    compiled, _ = compile_metrics2(METRICS, {'a': 'cps / bytes'})
+    output = pan_cli.metrics2_eval(compiled, {'cps': np.array([[2.0], [4.0]]), 'bytes': np.array([[1.0], [0.0]])})
+    assert output['a'][0, 0] == 2.0 and np.isnan(output['a'][1, 0])  # division by zero to NaN
@@ -0,0 +1,50 @@
+import pytest
+
+
+@pytest.fixture
+def summary(report, monkeypatch):
+    def summary(table, trim=(0, 0), percentiles=(), **kwargs):
+        monkeypatch.setitem(report.cf, 'bp_table_values_trim', trim)
+        monkeypatch.setitem(report.cf, 'bp_table_percentiles', list(percentiles))
+        return report.table_summary(table, **kwargs)
+    return summary
+
+
+TABLE = [
+    ["00:00:01", "1,000", "10"],
+    ["00:00:02", "~2,000", "20"],
+    ["00:00:03", "", "30"],  # blank cell, row dropped
+    ["00:00:04", "3,000", "40"],
+    ["00:00:05", "4,000", "n/a"],  # non-numeric cell, row dropped
+    ["00:00:06", "5,000", "60"],
+]
+
+
+def test_columns(summary):
+    s = summary(TABLE, indexes=[1, 2])
+    assert s[0] == {'cnt': 4, 'min': 1000.0, 'avg': 2750.0, 'med': 2500.0, 'max': 5000.0}
+    assert s[1] == {'cnt': 4, 'min': 10.0, 'avg': 32.5, 'med': 30.0, 'max': 60.0}
+
+
+def test_last_column_by_default(summary):
+    assert summary(TABLE)[0]['max'] == 60.0
+
+
+def test_last_only(summary):
+    assert summary(TABLE, indexes=[1, 2], last_only=True) == [5000.0, 60.0]
+
+
+def test_trim(summary):
+    table = [["", str(v)] for v in range(1, 11)]
+    assert summary(table, trim=(0.2, 0.1))[0] == {'cnt': 7, 'min': 3.0, 'avg': 6.0, 'med': 6.0, 'max': 9.0}
+
+
+def test_trim_left_only_when_right_set(summary):
+    table = [["", str(v)] for v in range(1, 11)]
+    assert summary(table, trim=(0.2, 0))[0]['cnt'] == 10  # as in earlier versions
+
+
+def test_percentiles(summary):
+    table = [["", str(v)] for v in range(0, 101)]
+    s = summary(table, percentiles=[90, 99])[0]
+    assert s['p90'] == 90.0 and s['p99'] == 99.0